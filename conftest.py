@@ -0,0 +1,5 @@
+def pytest_configure(config):
+    # те же тестовые настройки, что у manage.py test (core.testing)
+    from core.testing import test_settings
+
+    test_settings().enable()
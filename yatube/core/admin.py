@@ -0,0 +1,78 @@
+from django.contrib import admin
+
+from . import jobs, mail
+from .models import Email, Job
+
+
+def retry_jobs(modeladmin, request, queryset):
+    count = jobs.retry(queryset)
+    modeladmin.message_user(request, f'Возвращено в очередь задач: {count}')
+
+
+retry_jobs.short_description = 'Повторить выбранные'
+
+
+class JobAdmin(admin.ModelAdmin):
+    change_list_template = 'admin/core/job/change_list.html'
+    list_display = (
+        'pk',
+        'func',
+        'status',
+        'priority',
+        'attempts',
+        'run_at',
+        'finished',
+        'locked_by',
+    )
+    list_filter = ('status',)
+    search_fields = ('=func',)
+    ordering = ('-pk',)
+    show_full_result_count = False
+    actions = (retry_jobs,)
+    readonly_fields = (
+        'func', 'args', 'kwargs', 'attempts', 'created', 'started',
+        'finished', 'locked_by', 'last_error',
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = {'job_stats': jobs.stats(), **(extra_context or {})}
+        return super().changelist_view(request, extra_context)
+
+
+def retry_emails(modeladmin, request, queryset):
+    count = mail.retry(queryset)
+    modeladmin.message_user(request, f'Возвращено в очередь писем: {count}')
+
+
+retry_emails.short_description = 'Отправить выбранные ещё раз'
+
+
+class EmailAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'subject',
+        'recipients',
+        'status',
+        'attempts',
+        'created',
+        'sent',
+    )
+    list_filter = ('status',)
+    ordering = ('-pk',)
+    show_full_result_count = False
+    actions = (retry_emails,)
+    exclude = ('message',)
+    readonly_fields = (
+        'subject', 'recipients', 'status', 'attempts', 'claimed_by',
+        'claimed_at', 'created', 'sent', 'last_error',
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+
+admin.site.register(Job, JobAdmin)
+admin.site.register(Email, EmailAdmin)
@@ -0,0 +1,534 @@
+"""Кеш в файле SQLite, общий для всех процессов на одной машине.
+
+Файл работает в режиме WAL: читатели не блокируют писателя, поэтому
+все WSGI-процессы могут пользоваться одним кешем без memcached и Redis.
+Размер ограничен числом записей (MAX_ENTRIES) и объёмом (MAX_SIZE,
+в байтах); при переполнении вытесняются давно читавшиеся записи.
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.SQLiteCache',
+            'LOCATION': '/var/tmp/yatube-cache.sqlite3',
+            'OPTIONS': {'MAX_ENTRIES': 10000, 'MAX_SIZE': 64 * 2 ** 20},
+        }
+    }
+"""
+import collections
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+CREATE TABLE IF NOT EXISTS stats (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    entries INTEGER NOT NULL,
+    bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO stats VALUES (1, 0, 0);
+CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache BEGIN
+    UPDATE stats SET entries = entries + 1, bytes = bytes + new.size;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache BEGIN
+    UPDATE stats SET entries = entries - 1, bytes = bytes - old.size;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_update AFTER UPDATE OF size ON cache
+BEGIN
+    UPDATE stats SET bytes = bytes - old.size + new.size;
+END;
+"""
+
+# время последнего чтения обновляется не чаще, чем раз в столько секунд:
+# иначе каждое чтение превращалось бы в запись
+TOUCH_INTERVAL = 1
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._max_size = int(options.get('MAX_SIZE', 0)) or None
+        self._busy_timeout = float(options.get('BUSY_TIMEOUT', 5))
+        self._local = threading.local()
+
+    @property
+    def _db(self):
+        # соединение своё у каждого потока и каждого процесса после fork
+        pid = os.getpid()
+        if getattr(self._local, 'pid', None) != pid:
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(
+                self._path,
+                timeout=self._busy_timeout,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            db.executescript(SCHEMA)
+            self._local.db, self._local.pid = db, pid
+        return self._local.db
+
+    def _write(self, callback):
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            result = callback(db)
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+        return result
+
+    def _expires(self, timeout):
+        return self.get_backend_timeout(timeout)
+
+    def _insert(self, db, key, value, timeout, replace=True):
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        verb = 'REPLACE' if replace else 'IGNORE'
+        cursor = db.execute(
+            f'INSERT OR {verb} INTO cache VALUES (?, ?, ?, ?, ?)',
+            (key, data, self._expires(timeout), time.time(), len(data)),
+        )
+        return cursor.rowcount == 1
+
+    def _cull(self, db):
+        entries, size = db.execute(
+            'SELECT entries, bytes FROM stats'
+        ).fetchone()
+        over_entries = entries > self._max_entries
+        over_size = self._max_size is not None and size > self._max_size
+        if not (over_entries or over_size):
+            return
+        db.execute(
+            'DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?',
+            (time.time(),),
+        )
+        while True:
+            entries, size = db.execute(
+                'SELECT entries, bytes FROM stats'
+            ).fetchone()
+            over_size = self._max_size is not None and size > self._max_size
+            if not entries or not (entries > self._max_entries or over_size):
+                return
+            batch = max(entries // self._cull_frequency, 1)
+            db.execute(
+                'DELETE FROM cache WHERE key IN '
+                '(SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+                (batch,),
+            )
+
+    def _read(self, keys):
+        now = time.time()
+        placeholders = ', '.join('?' * len(keys))
+        rows = self._db.execute(
+            f'SELECT key, value, expires, accessed FROM cache '
+            f'WHERE key IN ({placeholders})',
+            keys,
+        ).fetchall()
+        found, stale = {}, []
+        for key, value, expires, accessed in rows:
+            if expires is not None and expires <= now:
+                continue
+            found[key] = pickle.loads(value)
+            if accessed < now - TOUCH_INTERVAL:
+                stale.append(key)
+        if stale:
+            placeholders = ', '.join('?' * len(stale))
+            self._db.execute(
+                f'UPDATE cache SET accessed = ? WHERE key IN ({placeholders})',
+                [now, *stale],
+            )
+        return found
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self._read([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        made = {self.make_key(key, version=version): key for key in keys}
+        for key in made:
+            self.validate_key(key)
+        if not made:
+            return {}
+        found = self._read(list(made))
+        return {made[key]: value for key, value in found.items()}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+
+        def write(db):
+            self._insert(db, key, value, timeout)
+            self._cull(db)
+        self._write(write)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        items = [
+            (self.make_key(key, version=version), value)
+            for key, value in data.items()
+        ]
+        for key, _ in items:
+            self.validate_key(key)
+
+        def write(db):
+            for key, value in items:
+                self._insert(db, key, value, timeout)
+            self._cull(db)
+        self._write(write)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+
+        def write(db):
+            db.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                (key, time.time()),
+            )
+            added = self._insert(db, key, value, timeout, replace=False)
+            self._cull(db)
+            return added
+        return self._write(write)
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+
+        def write(db):
+            row = db.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None or row[1] is not None and row[1] <= time.time():
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            db.execute(
+                'UPDATE cache SET value = ?, size = ? WHERE key = ?',
+                (data, len(data), key),
+            )
+            return value
+        return self._write(write)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        cursor = self._db.execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self._expires(timeout), key, time.time()),
+        )
+        return cursor.rowcount == 1
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return bool(self._read([key]))
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._db.execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_key(key, version=version) for key in keys]
+        if not keys:
+            return
+        placeholders = ', '.join('?' * len(keys))
+        self._db.execute(
+            f'DELETE FROM cache WHERE key IN ({placeholders})', keys
+        )
+
+    def clear(self):
+        self._db.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # соединение живёт всё время жизни потока, как и у LocMemCache
+        pass
+
+
+class Entry:
+    """Значение с мягким и жёстким сроком жизни."""
+
+    __slots__ = ('value', 'fresh_until', 'expires')
+
+    def __init__(self, value, fresh_until, expires):
+        self.value = value
+        self.fresh_until = fresh_until
+        self.expires = expires
+
+    def __getstate__(self):
+        return self.value, self.fresh_until, self.expires
+
+    def __setstate__(self, state):
+        self.value, self.fresh_until, self.expires = state
+
+
+_local_caches = {}
+_local_caches_lock = threading.Lock()
+
+
+class TieredCache(BaseCache):
+    """Двухуровневый кеш: LRU в памяти процесса перед общим кешем.
+
+    Второй уровень — любой другой кеш из CACHES (OPTIONS['L2']).
+    Первый уровень держит значения не дольше L1_TIMEOUT секунд, так что
+    записи других процессов видны с этой задержкой; ключи с префиксами
+    из L1_EXCLUDE (счётчики поколений) всегда читаются из общего кеша.
+
+    Просроченное значение ещё STALE_TIMEOUT секунд лежит в общем кеше.
+    Пересчитывает его один процесс, взявший блокировку, остальные в это
+    время получают старую копию: так шаблонный тег {% cache %} не
+    устраивает лавину одинаковых пересчётов. Если копии нет совсем,
+    ключей с префиксами из WAIT_PREFIXES (их всегда записывают после
+    промаха) остальные ждут до WAIT_TIMEOUT секунд. Для add и incr
+    просроченное значение уже отсутствует.
+    """
+
+    def __init__(self, name, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._l2_alias = options['L2']
+        self._l1_max_entries = int(options.get('L1_MAX_ENTRIES', 1000))
+        self._l1_timeout = float(options.get('L1_TIMEOUT', 5))
+        self._l1_exclude = tuple(options.get('L1_EXCLUDE', ('generation:',)))
+        self._stale_timeout = float(options.get('STALE_TIMEOUT', 60))
+        self._lock_timeout = int(options.get('LOCK_TIMEOUT', 10))
+        self._wait_timeout = float(options.get('WAIT_TIMEOUT', 0.5))
+        self._wait_prefixes = tuple(
+            options.get('WAIT_PREFIXES', ('template.cache.',))
+        )
+        with _local_caches_lock:
+            self._l1, self._l1_lock = _local_caches.setdefault(
+                name or self._l2_alias,
+                (collections.OrderedDict(), threading.Lock()),
+            )
+
+    @property
+    def _l2(self):
+        from django.core.cache import caches
+        return caches[self._l2_alias]
+
+    def _excluded(self, key):
+        return key.startswith(self._l1_exclude)
+
+    def _l1_get(self, key):
+        with self._l1_lock:
+            item = self._l1.get(key)
+            if item is None:
+                return None
+            entry, local_until = item
+            if local_until <= time.time():
+                del self._l1[key]
+                return None
+            self._l1.move_to_end(key)
+            return entry
+
+    def _l1_set(self, key, entry):
+        local_until = time.time() + self._l1_timeout
+        if entry.expires is not None:
+            local_until = min(local_until, entry.expires)
+        with self._l1_lock:
+            self._l1[key] = (entry, local_until)
+            self._l1.move_to_end(key)
+            while len(self._l1) > self._l1_max_entries:
+                self._l1.popitem(last=False)
+
+    def _l1_delete(self, *keys):
+        with self._l1_lock:
+            for key in keys:
+                self._l1.pop(key, None)
+
+    def _wrap(self, value, timeout):
+        """Значение для общего кеша и срок его хранения там."""
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return value, None
+        now = time.time()
+        l2_timeout = max(timeout + self._stale_timeout, 0)
+        return Entry(value, now + timeout, now + l2_timeout), l2_timeout
+
+    def _fetch(self, key, version):
+        """Запись из L1, а при промахе — из общего кеша."""
+        local_key = self.make_key(key, version=version)
+        self.validate_key(local_key)
+        entry = None if self._excluded(key) else self._l1_get(local_key)
+        if entry is None:
+            entry = self._l2.get(key, version=version)
+            if entry is None:
+                return None
+            if not isinstance(entry, Entry):
+                entry = Entry(entry, None, None)
+            if not self._excluded(key):
+                self._l1_set(local_key, entry)
+        return entry
+
+    def _acquire(self, key, version):
+        return self._l2.add(
+            f'lock:{key}', 1, self._lock_timeout, version=version
+        )
+
+    def get(self, key, default=None, version=None):
+        entry = self._fetch(key, version)
+        if entry is not None:
+            if entry.fresh_until is None or entry.fresh_until > time.time():
+                return entry.value
+            # устарело: пересчитывает тот, кто взял блокировку,
+            # остальные пока получают старую копию
+            if self._acquire(key, version):
+                return default
+            return entry.value
+
+        if not key.startswith(self._wait_prefixes):
+            return default
+        if self._acquire(key, version):
+            return default
+        # значение уже считает другой процесс: немного подождём его
+        deadline = time.time() + self._wait_timeout
+        while time.time() < deadline:
+            time.sleep(0.05)
+            entry = self._fetch(key, version)
+            if entry is not None:
+                return entry.value
+        return default
+
+    def get_many(self, keys, version=None):
+        found, missing = {}, []
+        for key in keys:
+            local_key = self.make_key(key, version=version)
+            self.validate_key(local_key)
+            entry = None if self._excluded(key) else self._l1_get(local_key)
+            if entry is None:
+                missing.append(key)
+            else:
+                found[key] = entry.value
+        for key, entry in self._l2.get_many(missing, version=version).items():
+            if not isinstance(entry, Entry):
+                entry = Entry(entry, None, None)
+            if not self._excluded(key):
+                self._l1_set(self.make_key(key, version=version), entry)
+            found[key] = entry.value
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_key(key, version=version)
+        self.validate_key(local_key)
+        stored, l2_timeout = self._wrap(value, timeout)
+        self._l2.set(key, stored, l2_timeout, version=version)
+        if self._excluded(key):
+            self._l1_delete(local_key)
+        else:
+            entry = stored if isinstance(stored, Entry) else Entry(
+                stored, None, None
+            )
+            self._l1_set(local_key, entry)
+        self._l2.delete(f'lock:{key}', version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        for key, value in data.items():
+            self.set(key, value, timeout, version=version)
+        return []
+
+    def _lock_update(self, key, version, wait=0):
+        """Блокировка на изменение записи Entry; взята ли она."""
+        deadline = time.time() + wait
+        while not self._l2.add(
+            f'update:{key}', 1, self._lock_timeout, version=version
+        ):
+            if time.time() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def _unlock_update(self, key, version):
+        self._l2.delete(f'update:{key}', version=version)
+
+    @staticmethod
+    def _expired(entry):
+        # мягко просроченная запись для add и incr считается отсутствующей
+        return (
+            isinstance(entry, Entry)
+            and entry.fresh_until is not None
+            and entry.fresh_until <= time.time()
+        )
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._l1_delete(self.make_key(key, version=version))
+        stored, l2_timeout = self._wrap(value, timeout)
+        if not self._expired(self._l2.get(key, version=version)):
+            return self._l2.add(key, stored, l2_timeout, version=version)
+        if not self._lock_update(key, version):
+            # просроченную запись прямо сейчас заменяет другой клиент
+            return False
+        try:
+            if not self._expired(self._l2.get(key, version=version)):
+                return self._l2.add(key, stored, l2_timeout, version=version)
+            self._l2.set(key, stored, l2_timeout, version=version)
+            return True
+        finally:
+            self._unlock_update(key, version)
+
+    def incr(self, key, delta=1, version=None):
+        self._l1_delete(self.make_key(key, version=version))
+        if not isinstance(self._l2.get(key, version=version), Entry):
+            # бессрочные значения лежат как есть: incr общего кеша атомарен
+            return self._l2.incr(key, delta, version=version)
+        locked = self._lock_update(key, version, wait=self._lock_timeout)
+        try:
+            entry = self._l2.get(key, version=version)
+            if entry is None or self._expired(entry):
+                raise ValueError(f"Key '{key}' not found")
+            if not isinstance(entry, Entry):
+                return self._l2.incr(key, delta, version=version)
+            value = entry.value + delta
+            # сроки жизни остаются прежними
+            self._l2.set(
+                key,
+                Entry(value, entry.fresh_until, entry.expires),
+                max(entry.expires - time.time(), 0),
+                version=version,
+            )
+            return value
+        finally:
+            if locked:
+                self._unlock_update(key, version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        entry = self._fetch(key, version)
+        if entry is None:
+            return False
+        self.set(key, entry.value, timeout, version=version)
+        return True
+
+    def has_key(self, key, version=None):
+        return self._fetch(key, version) is not None
+
+    def delete(self, key, version=None):
+        self._l1_delete(self.make_key(key, version=version))
+        self._l2.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        self._l1_delete(*(self.make_key(key, version=version) for key in keys))
+        self._l2.delete_many(keys, version=version)
+
+    def clear(self):
+        with self._l1_lock:
+            self._l1.clear()
+        self._l2.clear()
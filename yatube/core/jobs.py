@@ -0,0 +1,233 @@
+"""Очередь фоновых задач в базе данных проекта.
+
+Задача — строка core.Job: путь к функции уровня модуля и аргументы в
+JSON. Её ставят в той же транзакции, что и данные, поэтому обработчик
+(manage.py run_worker) не увидит задачу раньше коммита, а при откате она
+пропадёт вместе с данными.
+
+Обработчик берёт задачи по приоритету, затем по времени запуска. Где
+база умеет SELECT ... FOR UPDATE SKIP LOCKED, занятые строки просто
+пропускаются; в SQLite задача захватывается условным UPDATE ... WHERE
+status = 'queued', который выигрывает только один обработчик. Упавшая
+задача повторяется с экспоненциальной задержкой, пока не кончатся
+попытки. Задача, чей обработчик умер, через JOBS_LEASE снова считается
+свободной (поэтому JOBS_LEASE должен быть больше времени самой долгой
+задачи). Попытка засчитывается при захвате, так что задача, которая
+роняет сам обработчик, тоже когда-нибудь исчерпает попытки.
+"""
+import json
+import logging
+import os
+import random
+import socket
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+LOW = -10
+NORMAL = 0
+HIGH = 10
+
+# задержка перед n-й повторной попыткой: BACKOFF_BASE * 2 ** (n - 1)
+BACKOFF_BASE = 10
+BACKOFF_MAX = 60 * 60
+
+
+def _path(func):
+    path = f'{func.__module__}.{func.__qualname__}'
+    if '<' in path:
+        raise ValueError(
+            f'{path}: в очередь ставятся только функции уровня модуля'
+        )
+    return path
+
+
+def enqueue(func, args=(), kwargs=None, priority=NORMAL, delay=0,
+            max_attempts=None):
+    """Ставит func(*args, **kwargs) в очередь; аргументы — JSON."""
+    return Job.objects.create(
+        func=_path(func),
+        args=json.dumps(list(args)),
+        kwargs=json.dumps(kwargs or {}),
+        priority=priority,
+        max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def backoff(attempts):
+    """Задержка в секундах после attempts неудачных попыток.
+
+    Случайная добавка разводит задачи, упавшие одновременно, чтобы они
+    не возвращались одной пачкой.
+    """
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return delay + random.uniform(0, delay / 2)
+
+
+def _stale(now):
+    lease = now - timedelta(seconds=settings.JOBS_LEASE)
+    return Q(status=Job.RUNNING, started__lt=lease)
+
+
+def _ready(now):
+    return Job.objects.filter(
+        Q(status=Job.QUEUED, run_at__lte=now) | _stale(now)
+    )
+
+
+def _expire(now):
+    # брошенные задачи без оставшихся попыток больше не запускаются
+    Job.objects.filter(
+        _stale(now), attempts__gte=F('max_attempts')
+    ).update(
+        status=Job.FAILED,
+        locked_by='',
+        finished=now,
+        last_error='Обработчик не завершил задачу',
+    )
+
+
+def _candidates(now, limit):
+    return list(_ready(now).order_by(
+        '-priority', 'run_at', 'pk'
+    ).values_list('pk', flat=True)[:limit])
+
+
+def claim(worker, limit=1):
+    """Захватывает до limit готовых задач для обработчика worker."""
+    now = timezone.now()
+    _expire(now)
+    lock = {
+        'status': Job.RUNNING,
+        'locked_by': worker,
+        'started': now,
+        'attempts': F('attempts') + 1,
+    }
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            pks = list(_ready(now).order_by(
+                '-priority', 'run_at', 'pk'
+            ).select_for_update(skip_locked=True).values_list(
+                'pk', flat=True
+            )[:limit])
+            Job.objects.filter(pk__in=pks).update(**lock)
+    else:
+        # строки не блокируются: задачу получает тот, чей UPDATE изменил
+        # строку, остальные берут следующих кандидатов
+        pks = []
+        for pk in _candidates(now, limit * 2):
+            if _ready(now).filter(pk=pk).update(**lock):
+                pks.append(pk)
+                if len(pks) == limit:
+                    break
+    return list(Job.objects.filter(pk__in=pks).order_by(
+        '-priority', 'run_at', 'pk'
+    ))
+
+
+def _finish(job, **fields):
+    # только если задачу за это время не перехватил другой обработчик
+    Job.objects.filter(pk=job.pk, locked_by=job.locked_by).update(
+        locked_by='', **fields
+    )
+
+
+def run(job):
+    """Выполняет захваченную задачу и записывает результат."""
+    attempts = job.attempts
+    try:
+        func = import_string(job.func)
+        func(*json.loads(job.args), **json.loads(job.kwargs))
+    except Exception:
+        logger.exception('Задача %s упала', job)
+        error = traceback.format_exc()
+        if attempts < job.max_attempts:
+            _finish(
+                job,
+                status=Job.QUEUED,
+                last_error=error,
+                run_at=timezone.now() + timedelta(seconds=backoff(attempts)),
+            )
+        else:
+            _finish(
+                job,
+                status=Job.FAILED,
+                last_error=error,
+                finished=timezone.now(),
+            )
+        return False
+    _finish(job, status=Job.DONE, finished=timezone.now())
+    return True
+
+
+def run_pending(worker=None):
+    """Выполняет в текущем потоке все готовые задачи; число выполненных."""
+    worker = worker or worker_name()
+    count = 0
+    while True:
+        jobs = claim(worker)
+        if not jobs:
+            return count
+        run(jobs[0])
+        count += 1
+
+
+def retry(queryset):
+    """Возвращает задачи в очередь с новым запасом попыток."""
+    return queryset.exclude(status=Job.RUNNING).update(
+        status=Job.QUEUED,
+        attempts=0,
+        run_at=timezone.now(),
+        finished=None,
+        locked_by='',
+    )
+
+
+def purge(older_than=None):
+    """Удаляет выполненные задачи старше older_than секунд."""
+    if older_than is None:
+        older_than = settings.JOBS_KEEP_DONE
+    border = timezone.now() - timedelta(seconds=older_than)
+    return Job.objects.filter(
+        status=Job.DONE, finished__lt=border
+    ).delete()[0]
+
+
+def stats(now=None):
+    """Сводка для админки: задачи по состояниям и пропускная способность."""
+    now = now or timezone.now()
+    hour_ago = now - timedelta(hours=1)
+    by_status = dict(Job.objects.order_by().values_list('status').annotate(
+        count=Count('pk')
+    ))
+    finished = Job.objects.filter(finished__gte=hour_ago)
+    done_hour = finished.filter(status=Job.DONE).count()
+    return {
+        'statuses': [
+            (label, by_status.get(status, 0))
+            for status, label in Job.STATUSES
+        ],
+        'ready': Job.objects.filter(
+            status=Job.QUEUED, run_at__lte=now
+        ).count(),
+        'done_minute': finished.filter(
+            status=Job.DONE, finished__gte=now - timedelta(minutes=1)
+        ).count(),
+        'done_hour': done_hour,
+        'failed_hour': finished.filter(status=Job.FAILED).count(),
+        'per_minute': round(done_hour / 60, 1),
+    }
@@ -0,0 +1,198 @@
+"""Почта через очередь: запрос не ждёт ни диска, ни SMTP.
+
+QueuedEmailBackend (settings.EMAIL_BACKEND) только записывает письма в
+таблицу core.Email и в той же транзакции ставит задачу deliver в
+очередь core.jobs — при любом TASKS_BACKEND, чтобы неудачную отправку
+повторил manage.py run_worker, а письма не терялись вместе с процессом.
+Задача забирает письма порциями по EMAIL_BATCH_SIZE и отправляет каждую
+порцию через одно соединение настоящего бэкенда EMAIL_DELIVERY_BACKEND:
+SMTP, а локально — filebased или locmem. Письма, оставшиеся в очереди
+без задачи, run_worker подбирает сам (sweep).
+
+Письмо забирается условным UPDATE с меткой отправителя, поэтому
+несколько одновременных deliver не отправят его дважды; метка упавшего
+отправителя истекает через JOBS_LEASE. Письмо, которое не удалось
+отправить, остаётся в очереди до следующего deliver, пока не кончатся
+EMAIL_MAX_ATTEMPTS попыток.
+"""
+import logging
+import pickle
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import jobs
+from .models import Email, Job
+
+logger = logging.getLogger(__name__)
+
+
+class DeliveryError(Exception):
+    pass
+
+
+def _dump(message):
+    # соединение не сохраняется: при отправке будет своё
+    connection, message.connection = message.connection, None
+    try:
+        return pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+    finally:
+        message.connection = connection
+
+
+def schedule():
+    """Ставит отправку очереди писем; при TASKS_EAGER отправляет сразу."""
+    if settings.TASKS_EAGER:
+        deliver()
+        return
+    jobs.enqueue(deliver, priority=jobs.HIGH)
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    """Бэкенд, который ставит письма в очередь и сразу возвращается."""
+
+    def send_messages(self, email_messages):
+        emails = [
+            Email(
+                subject=str(message.subject)[:255],
+                recipients=', '.join(message.recipients()),
+                message=_dump(message),
+            )
+            for message in email_messages
+            if message.recipients()
+        ]
+        if not emails:
+            return 0
+        Email.objects.bulk_create(emails)
+        schedule()
+        return len(emails)
+
+
+def _claim(size, after):
+    """Забирает порцию писем с pk больше after; (письма, последний pk)."""
+    now = timezone.now()
+    lease = now - timedelta(seconds=settings.JOBS_LEASE)
+    pending = Email.objects.filter(
+        Q(claimed_by='') | Q(claimed_at__lt=lease),
+        status=Email.QUEUED,
+        pk__gt=after,
+    )
+    pks = list(pending.order_by('pk').values_list('pk', flat=True)[:size])
+    if not pks:
+        return [], None
+    token = uuid.uuid4().hex
+    pending.filter(pk__in=pks).update(claimed_by=token, claimed_at=now)
+    emails = Email.objects.filter(claimed_by=token).order_by('pk')
+    return list(emails), pks[-1]
+
+
+def _failed(email):
+    attempts = email.attempts + 1
+    Email.objects.filter(pk=email.pk).update(
+        status=(
+            Email.FAILED if attempts >= settings.EMAIL_MAX_ATTEMPTS
+            else Email.QUEUED
+        ),
+        attempts=attempts,
+        claimed_by='',
+        last_error=traceback.format_exc(),
+    )
+
+
+def _send_batch(emails):
+    """Отправляет порцию через одно соединение; число неудач."""
+    connection = get_connection(settings.EMAIL_DELIVERY_BACKEND)
+    try:
+        connection.open()
+    except Exception:
+        # сервер недоступен: письма вернутся в очередь без штрафа
+        Email.objects.filter(pk__in=[email.pk for email in emails]).update(
+            claimed_by=''
+        )
+        raise
+    failed = 0
+    try:
+        for email in emails:
+            try:
+                message = pickle.loads(email.message)
+                message.connection = connection
+                connection.send_messages([message])
+            except Exception:
+                logger.exception('Письмо %s не отправлено', email.pk)
+                _failed(email)
+                failed += 1
+            else:
+                Email.objects.filter(pk=email.pk).update(
+                    status=Email.SENT,
+                    attempts=F('attempts') + 1,
+                    claimed_by='',
+                    sent=timezone.now(),
+                )
+    finally:
+        connection.close()
+    return failed
+
+
+def deliver(batch_size=None):
+    """Отправляет все письма из очереди; число отправленных.
+
+    Если какие-то письма не ушли, в конце бросает DeliveryError, чтобы
+    очередь задач повторила deliver позже.
+    """
+    batch_size = batch_size or settings.EMAIL_BATCH_SIZE
+    sent = failed = 0
+    last = 0
+    while True:
+        emails, last = _claim(batch_size, last)
+        if last is None:
+            break
+        batch_failed = _send_batch(emails) if emails else 0
+        sent += len(emails) - batch_failed
+        failed += batch_failed
+    if failed:
+        raise DeliveryError(f'Не отправлено писем: {failed}')
+    return sent
+
+
+def retry(queryset):
+    """Возвращает письма в очередь с новым запасом попыток."""
+    count = queryset.exclude(status=Email.SENT).update(
+        status=Email.QUEUED, attempts=0, claimed_by=''
+    )
+    if count:
+        schedule()
+    return count
+
+
+def sweep():
+    """Ставит отправку, если в очереди есть письма, а задачи на них нет.
+
+    Так уходят письма, для которых задача deliver исчерпала попытки.
+    """
+    pending = Email.objects.filter(status=Email.QUEUED).exists()
+    if not pending:
+        return False
+    scheduled = Job.objects.filter(
+        func=f'{deliver.__module__}.{deliver.__qualname__}',
+        status__in=(Job.QUEUED, Job.RUNNING),
+    ).exists()
+    if scheduled:
+        return False
+    jobs.enqueue(deliver, priority=jobs.HIGH)
+    return True
+
+
+def purge(older_than=None):
+    """Удаляет отправленные письма старше older_than секунд."""
+    if older_than is None:
+        older_than = settings.JOBS_KEEP_DONE
+    border = timezone.now() - timedelta(seconds=older_than)
+    return Email.objects.filter(
+        status=Email.SENT, sent__lt=border
+    ).delete()[0]
@@ -0,0 +1,111 @@
+import signal
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core import jobs, mail
+
+# как часто удалять старые выполненные задачи и отправленные письма
+PURGE_INTERVAL = 60 * 60
+# как часто проверять, не осталось ли писем без задачи на отправку
+SWEEP_INTERVAL = 60
+
+
+def _run(job):
+    try:
+        return jobs.run(job)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Выполняет задачи из очереди core.jobs в пуле потоков'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=settings.TASK_WORKERS,
+            help='Сколько задач выполнять одновременно',
+        )
+        parser.add_argument(
+            '--poll',
+            type=float,
+            default=settings.JOBS_POLL_INTERVAL,
+            help='Пауза между опросами пустой очереди, секунд',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Выйти, когда готовые задачи кончатся',
+        )
+
+    def handle(self, *args, **options):
+        threads = options['threads']
+        if threads < 1:
+            raise CommandError('Нужен хотя бы один поток')
+        self.stop = threading.Event()
+        self.done = self.failed = 0
+        handlers = {
+            signum: signal.signal(signum, self._interrupt)
+            for signum in (signal.SIGINT, signal.SIGTERM)
+        }
+        try:
+            with ThreadPoolExecutor(
+                threads, thread_name_prefix='job'
+            ) as pool:
+                self._loop(pool, threads, options['poll'], options['once'])
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+            connections.close_all()
+        self.stdout.write(self.style.SUCCESS(
+            f'Выполнено задач: {self.done}, с ошибкой: {self.failed}'
+        ))
+
+    def _loop(self, pool, threads, poll, once):
+        worker = jobs.worker_name()
+        running = set()
+        purged_at = swept_at = None
+        while not self.stop.is_set():
+            if purged_at is None or (
+                time.monotonic() - purged_at > PURGE_INTERVAL
+            ):
+                jobs.purge()
+                mail.purge()
+                purged_at = time.monotonic()
+            if swept_at is None or (
+                time.monotonic() - swept_at > SWEEP_INTERVAL
+            ):
+                mail.sweep()
+                swept_at = time.monotonic()
+            free = threads - len(running)
+            claimed = jobs.claim(worker, free) if free else []
+            running |= {pool.submit(_run, job) for job in claimed}
+            if not running:
+                if once:
+                    break
+                self.stop.wait(poll)
+            elif not claimed or len(running) == threads:
+                # свободных потоков нет или очередь пуста: ждём, пока
+                # какая-нибудь задача закончится
+                finished, running = wait(
+                    running, poll, return_when=FIRST_COMPLETED
+                )
+                self._collect(finished)
+        # остановка: новые задачи не берутся, начатые доделываются
+        self._collect(running)
+
+    def _collect(self, futures):
+        for future in futures:
+            if future.result():
+                self.done += 1
+            else:
+                self.failed += 1
+
+    def _interrupt(self, signum, frame):
+        self.stop.set()
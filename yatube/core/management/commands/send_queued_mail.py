@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import mail
+
+
+class Command(BaseCommand):
+    help = 'Отправляет письма из очереди, не дожидаясь фоновой задачи'
+
+    def handle(self, *args, **options):
+        try:
+            sent = mail.deliver()
+        except mail.DeliveryError as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS(f'Отправлено писем: {sent}'))
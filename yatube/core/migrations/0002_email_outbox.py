@@ -0,0 +1,37 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Email',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(blank=True, max_length=255, verbose_name='Тема')),
+                ('recipients', models.TextField(verbose_name='Получатели')),
+                ('message', models.BinaryField(verbose_name='Письмо')),
+                ('status', models.CharField(choices=[('queued', 'В очереди'), ('sent', 'Отправлено'), ('failed', 'Не отправлено')], default='queued', max_length=10, verbose_name='Состояние')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')),
+                ('claimed_by', models.CharField(blank=True, max_length=32, verbose_name='Отправитель')),
+                ('claimed_at', models.DateTimeField(blank=True, null=True, verbose_name='Взято')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Поставлено')),
+                ('sent', models.DateTimeField(blank=True, null=True, verbose_name='Отправлено')),
+                ('last_error', models.TextField(blank=True, verbose_name='Последняя ошибка')),
+            ],
+            options={
+                'verbose_name': 'Письмо',
+                'verbose_name_plural': 'Письма',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='email',
+            index=models.Index(fields=['status', 'id'], name='email_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,87 @@
+from django.db import models
+
+
+class Job(models.Model):
+    """Фоновая задача в очереди базы данных (core.jobs)."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Не удалась'),
+    )
+
+    func = models.CharField('Функция', max_length=200)
+    args = models.TextField('Аргументы', default='[]')
+    kwargs = models.TextField('Именованные аргументы', default='{}')
+    priority = models.SmallIntegerField('Приоритет', default=0)
+    status = models.CharField(
+        'Состояние', max_length=10, choices=STATUSES, default=QUEUED
+    )
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveSmallIntegerField('Максимум попыток')
+    run_at = models.DateTimeField('Запустить не раньше')
+    created = models.DateTimeField('Поставлена', auto_now_add=True)
+    started = models.DateTimeField('Начата', null=True, blank=True)
+    finished = models.DateTimeField('Закончена', null=True, blank=True)
+    locked_by = models.CharField('Обработчик', max_length=100, blank=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+
+        indexes = [
+            # выбор следующей задачи обработчиком
+            models.Index(
+                fields=['status', '-priority', 'run_at', 'id'],
+                name='job_claim_idx'
+            ),
+            # пропускная способность и очистка выполненных
+            models.Index(
+                fields=['status', 'finished'], name='job_finished_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.func} #{self.pk}'
+
+
+class Email(models.Model):
+    """Письмо в очереди отправки (core.mail)."""
+    QUEUED = 'queued'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (SENT, 'Отправлено'),
+        (FAILED, 'Не отправлено'),
+    )
+
+    subject = models.CharField('Тема', max_length=255, blank=True)
+    recipients = models.TextField('Получатели')
+    # EmailMessage целиком, с вложениями и альтернативами
+    message = models.BinaryField('Письмо')
+    status = models.CharField(
+        'Состояние', max_length=10, choices=STATUSES, default=QUEUED
+    )
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    claimed_by = models.CharField('Отправитель', max_length=32, blank=True)
+    claimed_at = models.DateTimeField('Взято', null=True, blank=True)
+    created = models.DateTimeField('Поставлено', auto_now_add=True)
+    sent = models.DateTimeField('Отправлено', null=True, blank=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+
+    class Meta:
+        verbose_name = 'Письмо'
+        verbose_name_plural = 'Письма'
+
+        indexes = [
+            models.Index(fields=['status', 'id'], name='email_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.subject} → {self.recipients}'
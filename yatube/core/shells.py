@@ -0,0 +1,46 @@
+"""Общие для всех пользователей заготовки страниц.
+
+Страница рендерится один раз с отметками вместо персональных частей
+(тег {% personal %}), а для каждого запроса отметки заменяются
+маленькими шаблонами, отрисованными для текущего пользователя.
+
+Что рисовать на месте отметки, хранится на сервере, в самой заготовке
+(Shell.parts), а отметка — только номер части со случайной меткой этой
+отрисовки. Поэтому текст вида <!--personal:...--> из постов или
+комментариев ничего не подставит: метку он угадать не может.
+"""
+import re
+import secrets
+
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+
+def render(request, template_name, kwargs):
+    """Персональная часть страницы для пользователя запроса."""
+    return render_to_string(template_name, kwargs, request=request)
+
+
+class Shell:
+    """Персональные части одной отрисовки заготовки."""
+
+    def __init__(self, nonce=None, parts=()):
+        self.nonce = nonce or secrets.token_hex(16)
+        self.parts = list(parts)
+
+    def marker(self, template_name, kwargs):
+        self.parts.append((template_name, kwargs))
+        return mark_safe(
+            f'<!--personal:{self.nonce}:{len(self.parts) - 1}-->'
+        )
+
+    def fill(self, content, request):
+        """Заменяет отметки частями для пользователя запроса."""
+        def replace(match):
+            index = int(match.group(1))
+            if index >= len(self.parts):
+                return ''
+            template_name, kwargs = self.parts[index]
+            return render(request, template_name, kwargs)
+        marker = re.compile(rf'<!--personal:{self.nonce}:(\d+)-->')
+        return marker.sub(replace, content)
@@ -0,0 +1,42 @@
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, где имя файла — хеш его содержимого.
+
+    Файл из upload_to='posts/' с именем photo.JPG ляжет в
+    posts/ab/cd/abcd…ef.jpg: одинаковые загрузки хранятся один раз, а
+    содержимое по адресу никогда не меняется, так что браузеры и CDN
+    могут кешировать его бессрочно. Удалять такой файл можно, только
+    когда на него больше никто не ссылается.
+    """
+
+    CHUNK_SIZE = 64 * 2 ** 10
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in iter(lambda: content.read(self.CHUNK_SIZE), b''):
+            digest.update(chunk)
+        content.seek(0)
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        value = digest.hexdigest()
+        return os.path.join(
+            directory, value[:2], value[2:4], f'{value}{extension}'
+        )
+
+    def _save(self, name, content):
+        name = self.content_name(name, content)
+        if self.exists(name):
+            # свежая ссылка на старый файл: очистка по возрасту его не тронет
+            os.utime(self.path(name))
+            return name
+        # если тот же файл параллельно записал другой запрос, родитель
+        # сохранит копию под другим именем: лишний файл, но не ошибка
+        return super()._save(name, content)
@@ -0,0 +1,55 @@
+"""Фоновые задачи в пуле потоков процесса.
+
+Задача запускается только после коммита транзакции, в которой её
+поставили, иначе поток не увидел бы ещё не записанные строки. При
+settings.TASKS_EAGER задачи выполняются сразу, в том же потоке.
+
+При TASKS_BACKEND = 'jobs' задача вместо пула потоков ставится в очередь
+базы (core.jobs) в текущей транзакции и выполняется отдельным процессом
+manage.py run_worker; её аргументы тогда должны сериализоваться в JSON.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.TASK_WORKERS,
+                thread_name_prefix='task',
+            )
+        return _executor
+
+
+def _run(func, args, kwargs):
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception('Фоновая задача %s упала', func.__qualname__)
+    finally:
+        connections.close_all()
+
+
+def submit(func, *args, **kwargs):
+    """Выполняет func(*args, **kwargs) в фоне после коммита."""
+    if settings.TASKS_EAGER:
+        func(*args, **kwargs)
+        return
+    if settings.TASKS_BACKEND == 'jobs':
+        from . import jobs
+        jobs.enqueue(func, args, kwargs)
+        return
+    transaction.on_commit(
+        lambda: _get_executor().submit(_run, func, args, kwargs)
+    )
@@ -0,0 +1,19 @@
+from django import template
+
+from .. import shells
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def personal(context, template_name, **kwargs):
+    """Часть страницы, своя для каждого пользователя.
+
+    Шаблон видит только переданные аргументы и контекст-процессоры,
+    поэтому одинаково рисуется и сразу, и при заполнении заготовки.
+    """
+    request = context.get('request')
+    shell = getattr(request, 'page_shell', None)
+    if shell is not None:
+        return shell.marker(template_name, kwargs)
+    return shells.render(request, template_name, kwargs)
@@ -0,0 +1,35 @@
+"""Настройки, с которыми гоняются тесты.
+
+Тестовая база каждый раз новая, поэтому общий кеш у тестов свой, в
+памяти, а не файл запущенного сервера, и фоновые задачи выполняются
+сразу, в том же потоке. Включаются запускателем тестов (TEST_RUNNER)
+для manage.py test и хуком conftest.py для pytest, а не по признакам
+процесса в settings.py.
+"""
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+def test_settings():
+    return override_settings(
+        CACHES={
+            **settings.CACHES,
+            'shared': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'TIMEOUT': 20,
+            },
+        },
+        TASKS_EAGER=True,
+    )
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.test_settings = test_settings()
+        self.test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.test_settings.disable()
+        super().teardown_test_environment(**kwargs)
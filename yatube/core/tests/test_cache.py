@@ -0,0 +1,169 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+from ..cache import Entry, SQLiteCache, TieredCache
+
+
+def set_in_child(location, key, value):
+    SQLiteCache(location, {}).set(key, value)
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.location, {'OPTIONS': options})
+
+    def test_basic_operations(self):
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(self.cache.get('key'), {'value': 1})
+        self.assertFalse(self.cache.add('key', 'other'))
+        self.assertTrue(self.cache.add('new', 'value'))
+        self.assertEqual(
+            self.cache.get_many(['key', 'new', 'missing']),
+            {'key': {'value': 1}, 'new': 'value'},
+        )
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('new'))
+
+    def test_expired_entries_are_not_returned(self):
+        self.cache.set('key', 'value', timeout=-1)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 'fresh'))
+        self.assertEqual(self.cache.get('key'), 'fresh')
+
+    def test_incr(self):
+        self.cache.set('counter', 1, timeout=None)
+        self.assertEqual(self.cache.incr('counter', 2), 3)
+        self.assertEqual(self.make_cache().get('counter'), 3)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_shared_between_processes(self):
+        context = multiprocessing.get_context('fork')
+        child = context.Process(
+            target=set_in_child, args=(self.location, 'shared', 'value')
+        )
+        child.start()
+        child.join()
+        self.assertEqual(self.cache.get('shared'), 'value')
+
+    @mock.patch('core.cache.TOUCH_INTERVAL', -1)
+    def test_max_entries_evicts_least_recently_read(self):
+        cache = self.make_cache(MAX_ENTRIES=3, CULL_FREQUENCY=3)
+        for key in ('a', 'b', 'c'):
+            cache.set(key, key)
+        cache.get('a')
+        cache.set('d', 'd')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get_many(['a', 'c', 'd']), {
+            'a': 'a', 'c': 'c', 'd': 'd'
+        })
+
+    def test_max_size_caps_stored_bytes(self):
+        cache = self.make_cache(MAX_SIZE=4096)
+        for number in range(20):
+            cache.set(f'key{number}', b'x' * 1000)
+        size, = cache._db.execute('SELECT bytes FROM stats').fetchone()
+        self.assertLessEqual(size, 4096)
+        self.assertIsNotNone(cache.get('key19'))
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'tiered-l2': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tiered-l2',
+    },
+})
+class TieredCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.l2 = caches['tiered-l2']
+        self.l2.clear()
+        self.cache = self.make_cache()
+        self.cache.clear()
+
+    def make_cache(self, name='', **options):
+        # name отделяет память процессов друг от друга
+        options.setdefault('L2', 'tiered-l2')
+        return TieredCache(self.id() + name, {'OPTIONS': options})
+
+    def test_reads_are_served_from_memory(self):
+        self.cache.set('key', 'value')
+        self.l2.delete('key')
+        self.assertEqual(self.cache.get('key'), 'value')
+        self.assertEqual(self.cache.get_many(['key']), {'key': 'value'})
+
+    def test_memory_copy_expires_after_l1_timeout(self):
+        cache = self.make_cache(L1_TIMEOUT=0)
+        cache.set('key', 'value')
+        self.l2.delete('key')
+        self.assertIsNone(cache.get('key'))
+
+    def test_generations_are_read_from_shared_cache(self):
+        self.cache.set('generation:all', 1, timeout=None)
+        self.l2.incr('generation:all')
+        self.assertEqual(self.cache.get('generation:all'), 2)
+        self.assertEqual(self.cache.incr('generation:all'), 3)
+
+    def test_incr_keeps_timeout(self):
+        self.cache.set('counter', 1, 60)
+        self.assertEqual(self.cache.incr('counter'), 2)
+        self.assertEqual(self.cache.decr('counter', 5), -3)
+        self.assertTrue(self.cache.add('added', 0, 60))
+        self.assertEqual(self.cache.incr('added'), 1)
+        other = self.make_cache('other')
+        self.assertEqual(other.get_many(['counter', 'added']), {
+            'counter': -3, 'added': 1,
+        })
+        self.assertIsInstance(self.l2.get('counter'), Entry)
+        self.assertIsNone(self.l2.get('update:counter'))
+        self.cache.set('counter', 1, timeout=0)
+        with self.assertRaises(ValueError):
+            self.cache.incr('counter')
+
+    def test_add_replaces_expired_value(self):
+        self.cache.set('key', 'old', timeout=0)
+        # в общем кеше старая копия ещё лежит STALE_TIMEOUT секунд
+        self.assertIsNotNone(self.l2.get('key'))
+        self.assertTrue(self.cache.add('key', 'new', 60))
+        self.assertFalse(self.cache.add('key', 'newer', 60))
+        self.assertEqual(self.cache.get('key'), 'new')
+        self.assertIsNone(self.l2.get('update:key'))
+
+    def test_stale_value_served_while_one_client_recomputes(self):
+        self.cache.set('key', 'old', timeout=0)
+        # первый клиент берёт блокировку и пересчитывает значение
+        self.assertIsNone(self.cache.get('key'))
+        other = self.make_cache('other', L1_TIMEOUT=0)
+        self.assertEqual(other.get('key'), 'old')
+        self.assertEqual(self.cache.get('key'), 'old')
+        self.cache.set('key', 'new')
+        self.assertEqual(other.get('key'), 'new')
+        self.assertIsNone(self.l2.get('lock:key'))
+
+    def test_missing_key_waits_for_concurrent_fill(self):
+        cache = self.make_cache(WAIT_TIMEOUT=0.2)
+        self.assertIsNone(cache.get('template.cache.page'))
+        with mock.patch('core.cache.time.sleep') as sleep:
+            sleep.side_effect = lambda seconds: self.l2.set(
+                'template.cache.page', 'page'
+            )
+            self.assertEqual(cache.get('template.cache.page'), 'page')
+        # обычные ключи на промахе не ждут и блокировку не берут
+        self.assertIsNone(cache.get('thumbnail'))
+        self.assertIsNone(self.l2.get('lock:thumbnail'))
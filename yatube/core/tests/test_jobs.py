@@ -0,0 +1,179 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import jobs, tasks
+from ..models import Job
+
+CALLS = []
+
+
+def record(*args, **kwargs):
+    CALLS.append((args, kwargs))
+
+
+def explode():
+    raise RuntimeError('сломалось')
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_enqueued_job_runs_with_arguments(self):
+        job = jobs.enqueue(record, (1, 'два'), {'three': [3]})
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(jobs.run_pending('test'), 1)
+        self.assertEqual(CALLS, [((1, 'два'), {'three': [3]})])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(job.locked_by, '')
+        self.assertIsNotNone(job.finished)
+
+    def test_only_module_level_functions(self):
+        with self.assertRaises(ValueError):
+            jobs.enqueue(lambda: None)
+
+    def test_priority_then_run_at(self):
+        jobs.enqueue(record, ('low',), priority=jobs.LOW)
+        jobs.enqueue(record, ('first',))
+        jobs.enqueue(record, ('later',), delay=60)
+        jobs.enqueue(record, ('high',), priority=jobs.HIGH)
+        jobs.enqueue(record, ('second',))
+        jobs.run_pending('test')
+        self.assertEqual(
+            [args[0] for args, _ in CALLS], ['high', 'first', 'second', 'low']
+        )
+        self.assertTrue(Job.objects.filter(
+            status=Job.QUEUED, args='["later"]'
+        ).exists())
+
+    def test_claimed_job_is_not_claimed_again(self):
+        jobs.enqueue(record)
+        self.assertEqual(len(jobs.claim('first')), 1)
+        self.assertEqual(jobs.claim('second'), [])
+
+    def test_failed_job_retried_with_backoff(self):
+        job = jobs.enqueue(explode, max_attempts=2)
+        with mock.patch('core.jobs.random.uniform', return_value=0):
+            with self.assertLogs('core.jobs', 'ERROR'):
+                jobs.run_pending('test')
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.attempts, 1)
+        self.assertIn('сломалось', job.last_error)
+        delay = (job.run_at - timezone.now()).total_seconds()
+        self.assertAlmostEqual(delay, jobs.BACKOFF_BASE, delta=2)
+        # задержка ещё не прошла
+        self.assertEqual(jobs.run_pending('test'), 0)
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        with self.assertLogs('core.jobs', 'ERROR'):
+            jobs.run_pending('test')
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertIsNotNone(job.finished)
+
+    def test_backoff_grows_exponentially(self):
+        with mock.patch('core.jobs.random.uniform', return_value=0):
+            self.assertEqual(
+                [jobs.backoff(attempt) for attempt in (1, 2, 3)],
+                [jobs.BACKOFF_BASE, 2 * jobs.BACKOFF_BASE,
+                 4 * jobs.BACKOFF_BASE],
+            )
+            self.assertEqual(jobs.backoff(100), jobs.BACKOFF_MAX)
+
+    @override_settings(JOBS_LEASE=60)
+    def test_abandoned_job_is_reclaimed(self):
+        job = jobs.enqueue(record, max_attempts=2)
+        jobs.claim('dead')
+        self.assertEqual(jobs.claim('alive'), [])
+        long_ago = timezone.now() - timedelta(minutes=5)
+        Job.objects.filter(pk=job.pk).update(started=long_ago)
+        self.assertEqual(jobs.run_pending('alive'), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.attempts, 2)
+
+    @override_settings(JOBS_LEASE=60)
+    def test_abandoned_job_without_attempts_fails(self):
+        job = jobs.enqueue(record, max_attempts=1)
+        jobs.claim('dead')
+        long_ago = timezone.now() - timedelta(minutes=5)
+        Job.objects.filter(pk=job.pk).update(started=long_ago)
+        self.assertEqual(jobs.run_pending('alive'), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(CALLS, [])
+
+    def test_retry_and_purge(self):
+        job = jobs.enqueue(explode, max_attempts=1)
+        with self.assertLogs('core.jobs', 'ERROR'):
+            jobs.run_pending('test')
+        self.assertEqual(jobs.retry(Job.objects.all()), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 0))
+
+        done = jobs.enqueue(record)
+        jobs.run_pending('test')
+        Job.objects.filter(pk=done.pk).update(
+            finished=timezone.now() - timedelta(days=30)
+        )
+        self.assertEqual(jobs.purge(), 1)
+        self.assertFalse(Job.objects.filter(pk=done.pk).exists())
+
+    @override_settings(TASKS_EAGER=False, TASKS_BACKEND='jobs')
+    def test_tasks_submit_uses_queue(self):
+        tasks.submit(record, 'name', options={'crop': 'center'})
+        self.assertEqual(CALLS, [])
+        job = Job.objects.get()
+        self.assertEqual(job.func, 'core.tests.test_jobs.record')
+        jobs.run_pending('test')
+        self.assertEqual(
+            CALLS, [(('name',), {'options': {'crop': 'center'}})]
+        )
+
+    def test_admin_shows_throughput(self):
+        admin = get_user_model().objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        jobs.enqueue(record)
+        jobs.enqueue(explode, max_attempts=1)
+        with self.assertLogs('core.jobs', 'ERROR'):
+            jobs.run_pending('test')
+        self.client.force_login(admin)
+        response = self.client.get(reverse('admin:core_job_changelist'))
+        self.assertEqual(response.status_code, 200)
+        stats = response.context['job_stats']
+        self.assertEqual(stats['done_hour'], 1)
+        self.assertEqual(stats['failed_hour'], 1)
+        self.assertIn(('Выполнена', 1), stats['statuses'])
+        self.assertContains(response, 'Пропускная способность очереди')
+
+
+class RunWorkerTests(TransactionTestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_once_runs_ready_jobs_in_threads(self):
+        for number in range(5):
+            jobs.enqueue(record, (number,))
+        jobs.enqueue(explode, max_attempts=1)
+        out = StringIO()
+        with self.assertLogs('core.jobs', 'ERROR'):
+            call_command('run_worker', threads=2, once=True, stdout=out)
+        self.assertEqual(
+            sorted(args[0] for args, _ in CALLS), [0, 1, 2, 3, 4]
+        )
+        self.assertIn('Выполнено задач: 5, с ошибкой: 1', out.getvalue())
+        self.assertEqual(
+            Job.objects.filter(status=Job.DONE).count(), 5
+        )
@@ -0,0 +1,167 @@
+from django.contrib.auth import get_user_model
+from django.core import mail as django_mail
+from django.core.mail import EmailMultiAlternatives, send_mail
+from django.core.mail.backends import locmem
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import jobs, mail
+from ..models import Email, Job
+
+
+class CountingBackend(locmem.EmailBackend):
+    opened = 0
+
+    def open(self):
+        CountingBackend.opened += 1
+        return super().open()
+
+
+class FailingBackend(locmem.EmailBackend):
+    def send_messages(self, messages):
+        if any('bad' in address for address in messages[0].recipients()):
+            raise OSError('ящик не существует')
+        return super().send_messages(messages)
+
+
+class UnreachableBackend(locmem.EmailBackend):
+    def open(self):
+        raise OSError('сервер недоступен')
+
+
+@override_settings(
+    EMAIL_BACKEND='core.mail.QueuedEmailBackend',
+    EMAIL_DELIVERY_BACKEND='core.tests.test_mail.CountingBackend',
+)
+class QueuedEmailTests(TestCase):
+    def setUp(self):
+        CountingBackend.opened = 0
+
+    def send(self, *recipients):
+        for recipient in recipients:
+            send_mail('Тема', 'Текст', 'from@example.com', [recipient])
+
+    @override_settings(TASKS_EAGER=False, TASKS_BACKEND='threads')
+    def test_send_only_queues_message(self):
+        self.send('reader@example.com')
+        self.assertEqual(django_mail.outbox, [])
+        email = Email.objects.get()
+        self.assertEqual(email.status, Email.QUEUED)
+        self.assertEqual(email.recipients, 'reader@example.com')
+        self.assertEqual(Job.objects.get().func, 'core.mail.deliver')
+
+        jobs.run_pending('test')
+        self.assertEqual(len(django_mail.outbox), 1)
+        self.assertEqual(django_mail.outbox[0].subject, 'Тема')
+        email.refresh_from_db()
+        self.assertEqual(email.status, Email.SENT)
+        self.assertIsNotNone(email.sent)
+
+    @override_settings(
+        TASKS_EAGER=False,
+        EMAIL_DELIVERY_BACKEND='core.tests.test_mail.FailingBackend',
+        EMAIL_MAX_ATTEMPTS=10,
+    )
+    def test_failed_delivery_is_retried_by_queue(self):
+        self.send('bad@example.com')
+        job = Job.objects.get()
+        with self.assertLogs('core.mail', 'ERROR'):
+            with self.assertLogs('core.jobs', 'ERROR'):
+                jobs.run_pending('test')
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+
+        # задача исчерпала попытки, а письмо осталось в очереди
+        Job.objects.filter(pk=job.pk).update(status=Job.FAILED)
+        self.assertTrue(mail.sweep())
+        self.assertFalse(mail.sweep())
+        self.assertEqual(
+            Job.objects.filter(status=Job.QUEUED).count(), 1
+        )
+        Email.objects.update(status=Email.SENT)
+        Job.objects.all().delete()
+        self.assertFalse(mail.sweep())
+
+    @override_settings(TASKS_EAGER=False, TASKS_BACKEND='jobs')
+    def test_batches_share_connection(self):
+        self.send(*(f'reader{number}@example.com' for number in range(5)))
+        self.assertEqual(mail.deliver(batch_size=2), 5)
+        self.assertEqual(CountingBackend.opened, 3)
+        self.assertEqual(len(django_mail.outbox), 5)
+        # уже отправленные письма второй раз не уходят
+        self.assertEqual(mail.deliver(), 0)
+        self.assertEqual(len(django_mail.outbox), 5)
+
+    def test_message_survives_queue(self):
+        message = EmailMultiAlternatives(
+            'Сброс пароля', 'Текст', 'from@example.com',
+            ['reader@example.com'], cc=['copy@example.com'],
+        )
+        message.attach_alternative('<p>Текст</p>', 'text/html')
+        message.attach('note.txt', 'вложение', 'text/plain')
+        message.send()
+        sent = django_mail.outbox[0]
+        self.assertEqual(
+            sent.recipients(), ['reader@example.com', 'copy@example.com']
+        )
+        self.assertEqual(sent.alternatives, [('<p>Текст</p>', 'text/html')])
+        self.assertEqual(
+            sent.attachments, [('note.txt', 'вложение', 'text/plain')]
+        )
+
+    @override_settings(
+        TASKS_EAGER=False,
+        TASKS_BACKEND='jobs',
+        EMAIL_DELIVERY_BACKEND='core.tests.test_mail.FailingBackend',
+        EMAIL_MAX_ATTEMPTS=2,
+    )
+    def test_failed_message_stays_queued(self):
+        self.send('bad@example.com', 'good@example.com')
+        with self.assertLogs('core.mail', 'ERROR'):
+            with self.assertRaises(mail.DeliveryError):
+                mail.deliver()
+        self.assertEqual(
+            [message.to for message in django_mail.outbox],
+            [['good@example.com']],
+        )
+        bad = Email.objects.get(recipients='bad@example.com')
+        self.assertEqual((bad.status, bad.attempts), (Email.QUEUED, 1))
+        self.assertIn('ящик не существует', bad.last_error)
+
+        with self.assertLogs('core.mail', 'ERROR'):
+            with self.assertRaises(mail.DeliveryError):
+                mail.deliver()
+        bad.refresh_from_db()
+        self.assertEqual((bad.status, bad.attempts), (Email.FAILED, 2))
+
+        self.assertEqual(mail.retry(Email.objects.all()), 1)
+        bad.refresh_from_db()
+        self.assertEqual((bad.status, bad.attempts), (Email.QUEUED, 0))
+
+    @override_settings(
+        TASKS_EAGER=False,
+        TASKS_BACKEND='jobs',
+        EMAIL_DELIVERY_BACKEND='core.tests.test_mail.UnreachableBackend',
+    )
+    def test_unreachable_server_keeps_messages(self):
+        self.send('reader@example.com')
+        with self.assertRaises(OSError):
+            mail.deliver()
+        email = Email.objects.get()
+        self.assertEqual(
+            (email.status, email.attempts, email.claimed_by),
+            (Email.QUEUED, 0, ''),
+        )
+
+    def test_password_reset_goes_through_queue(self):
+        get_user_model().objects.create_user(
+            'reader', 'reader@example.com', 'password'
+        )
+        response = self.client.post(
+            reverse('users:password_reset'), {'email': 'reader@example.com'}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(django_mail.outbox), 1)
+        self.assertEqual(
+            Email.objects.get().status, Email.SENT
+        )
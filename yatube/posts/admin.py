@@ -1,9 +1,133 @@
+from django import forms
 from django.contrib import admin
+from django.contrib.admin import helpers
+from django.contrib.admin.helpers import ActionForm
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.template.response import TemplateResponse
+from django.utils.functional import cached_property
 
-from .models import Group, Post, Comment, Follow
+from . import search
+from .models import Group, Post, Comment, Follow, User
 
+# дальше этого строки в списках админки не считаются
+COUNT_LIMIT = 10000
+BATCH_SIZE = 500
 
-class PostAdmin(admin.ModelAdmin):
+
+class BoundedCountPaginator(Paginator):
+    """Пагинатор, который считает не больше COUNT_LIMIT строк.
+
+    COUNT(*) по большой таблице читает её целиком, а COUNT по подзапросу
+    с LIMIT останавливается на пределе. Страницы дальше предела в списке
+    недоступны: до таких строк добираются поиском и фильтрами.
+    """
+
+    @cached_property
+    def count(self):
+        return self.object_list.order_by()[:COUNT_LIMIT].count()
+
+
+def batches(queryset, size=None):
+    """pk объектов набора порциями по возрастанию.
+
+    Каждая порция выбирается отдельным запросом после последнего pk,
+    поэтому объекты можно менять и удалять, не держа в памяти весь набор.
+    """
+    size = size or BATCH_SIZE
+    last = None
+    while True:
+        page = queryset.order_by('pk')
+        if last is not None:
+            page = page.filter(pk__gt=last)
+        pks = list(page.values_list('pk', flat=True)[:size])
+        if not pks:
+            return
+        yield pks
+        last = pks[-1]
+
+
+def delete_in_batches(modeladmin, request, queryset):
+    """Удаляет выбранное порциями после подтверждения.
+
+    На странице подтверждения только число объектов (не больше
+    COUNT_LIMIT): стандартная загружает их все вместе со связанными.
+    Сигналы (счётчики, ленты, поиск) срабатывают как обычно.
+    """
+    if request.POST.get('post') != 'yes':
+        total = queryset.order_by()[:COUNT_LIMIT + 1].count()
+        return TemplateResponse(
+            request,
+            'admin/delete_in_batches_confirmation.html',
+            {
+                **modeladmin.admin_site.each_context(request),
+                'title': 'Удалить выбранные объекты?',
+                'opts': queryset.model._meta,
+                'count': min(total, COUNT_LIMIT),
+                'more': total > COUNT_LIMIT,
+                'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+                'selected': request.POST.getlist(
+                    helpers.ACTION_CHECKBOX_NAME
+                ),
+                'select_across': request.POST.get('select_across', '0'),
+            },
+        )
+    deleted = 0
+    for pks in batches(queryset):
+        deleted += len(pks)
+        queryset.model.objects.filter(pk__in=pks).delete()
+    modeladmin.message_user(request, f'Удалено объектов: {deleted}')
+
+
+delete_in_batches.short_description = 'Удалить выбранные'
+delete_in_batches.allowed_permissions = ('delete',)
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    """Список, который стоит одинаково при любом размере таблицы."""
+
+    paginator = BoundedCountPaginator
+    show_full_result_count = False
+    actions = (delete_in_batches,)
+
+    def get_actions(self, request):
+        # стандартное удаление грузит все объекты ради подтверждения
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+
+class TextSearchMixin:
+    """Поиск по тексту через полнотекстовый индекс вместо LIKE."""
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return search.filter_matching(queryset, search_term), False
+
+
+class MoveToGroupForm(ActionForm):
+    group = forms.ModelChoiceField(
+        Group.objects.all(), required=False, label='Группа'
+    )
+
+
+def move_to_group(modeladmin, request, queryset):
+    group = request.POST.get('group') or None
+    moved = 0
+    for pks in batches(queryset):
+        # по одному, чтобы сигналы перенесли посты между лентами групп
+        for post in Post.objects.filter(pk__in=pks):
+            post.group_id = group
+            post.save(update_fields=('group',))
+            moved += 1
+    modeladmin.message_user(request, f'Перенесено постов: {moved}')
+
+
+move_to_group.short_description = 'Перенести в группу'
+
+
+class PostAdmin(TextSearchMixin, ScalableAdmin):
     list_display = (
         'pk',
         'text',
@@ -11,9 +135,13 @@ class PostAdmin(admin.ModelAdmin):
         'author',
         'group',
     )
-    list_editable = ('group',)
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
+    autocomplete_fields = ('author', 'group')
+    action_form = MoveToGroupForm
+    actions = ScalableAdmin.actions + (move_to_group,)
     empty_value_display = '-пусто-'
 
 
@@ -28,21 +156,38 @@ class GroupAdmin(admin.ModelAdmin):
     search_fields = ('title', 'slug',)
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(TextSearchMixin, ScalableAdmin):
     list_display = (
+        'pk',
         'post',
         'author',
         'text',
+        'created',
     )
-    list_editable = ('text', 'author',)
-    search_fields = ('post', )
+    list_select_related = ('post', 'author')
+    search_fields = ('text',)
+    date_hierarchy = 'created'
+    autocomplete_fields = ('post', 'author')
 
 
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(ScalableAdmin):
     list_display = (
         'user',
         'author',
     )
+    list_select_related = ('user', 'author')
+    search_fields = ('=user__username', '=author__username')
+    autocomplete_fields = ('user', 'author')
+
+    def get_search_results(self, request, queryset, search_term):
+        # точное имя находится по уникальному индексу, а не сравнением
+        # без учёта регистра по всей таблице
+        if not search_term:
+            return queryset, False
+        users = User.objects.filter(username=search_term).values('pk')
+        return queryset.filter(
+            Q(user__in=users) | Q(author__in=users)
+        ), False
 
 
 admin.site.register(Post, PostAdmin)
@@ -0,0 +1,239 @@
+"""JSON API только для чтения: те же ленты, что и на HTML-страницах.
+
+Строки выбираются через .values() только с запрошенными полями
+(параметр fields=id,text,...) и сразу сериализуются, без экземпляров
+моделей и шаблонов. Ленты листаются курсором (параметр cursor) без
+COUNT(*), как «Показать ещё» у комментариев; лента подписок собирается
+теми же чтениями по ключу, что и HTML-страница (posts.timeline).
+Публичные ответы, как и HTML-страницы, кешируются по поколениям
+(posts.middleware).
+"""
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.http import JsonResponse
+
+from . import generations, timeline
+from .boundaries import feed_key
+from .counters import user_counters
+from .models import Group, Post, User
+from .paginator import get_chunk, get_merged_page
+
+# имя поля в ответе: путь в .values()
+POST_FIELDS = {
+    'id': 'pk',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'image_width': 'image_width',
+    'image_height': 'image_height',
+    'comments_count': 'comments_count',
+}
+COMMENT_FIELDS = {
+    'id': 'pk',
+    'text': 'text',
+    'created': 'created',
+    'author': 'author__username',
+}
+
+
+class InvalidFields(ValueError):
+    pass
+
+
+def _json(data, status=200):
+    # кириллица без \uXXXX почти вдвое короче
+    return JsonResponse(
+        data, status=status, json_dumps_params={'ensure_ascii': False}
+    )
+
+
+def _error(message, status):
+    return _json({'detail': message}, status)
+
+
+def _fields(request, available):
+    """Запрошенные поля ответа; без параметра — все."""
+    raw = request.GET.get('fields')
+    if not raw:
+        return list(available)
+    fields = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in available]
+    if unknown or not fields:
+        raise InvalidFields(
+            'Неизвестные поля: ' + ', '.join(unknown) if unknown
+            else 'Не выбрано ни одного поля'
+        )
+    return fields
+
+
+def _image_url(name):
+    if not name:
+        return None
+    return Post._meta.get_field('image').storage.url(name)
+
+
+def _serialize(row, paths):
+    """Строка .values() в словарь ответа: {имя поля: путь}."""
+    item = {name: row[path] for name, path in paths.items()}
+    if 'image' in item:
+        item['image'] = _image_url(item['image'])
+    return item
+
+
+def _paths(fields, available, prefix=''):
+    paths = {}
+    for name in fields:
+        path = available[name]
+        if prefix:
+            path = f'{prefix}__{path}' if path != 'pk' else f'{prefix}_id'
+        paths[name] = path
+    return paths
+
+
+def _feed(request, queryset, available, date_field, pk_field='pk',
+          prefix='', per_page=None, merge=(), **extra):
+    """Порция ленты по курсору: {'results': [...], 'next': url}.
+
+    merge — наборы постов, которые сливаются с queryset по ключу
+    (см. paginator.get_merged_page).
+    """
+    try:
+        fields = _fields(request, available)
+    except InvalidFields as error:
+        return _error(str(error), 400)
+    per_page = per_page or settings.MAX_POSTS
+    sources = [(queryset, pk_field, prefix)]
+    sources += [(posts, 'pk', '') for posts in merge]
+    paths, rows = [], []
+    for source, source_pk, source_prefix in sources:
+        source_paths = _paths(fields, available, source_prefix)
+        paths.append(source_paths)
+        # ключ курсора выбирается всегда, даже если поле не запрошено
+        rows.append((source.values(
+            *set(source_paths.values()) | {date_field, source_pk}
+        ), source_pk))
+    if merge:
+        page = get_merged_page(request, rows, per_page, date_field)
+        origins = page.origins
+    else:
+        page = get_chunk(
+            request,
+            rows[0][0],
+            per_page,
+            date_field=date_field,
+            pk_field=pk_field,
+        )
+        origins = [0] * len(page.object_list)
+    next_url = None
+    if page.next_cursor:
+        query = request.GET.copy()
+        query['cursor'] = page.next_cursor
+        next_url = request.build_absolute_uri(
+            f'{request.path}?{query.urlencode()}'
+        )
+    return _json({
+        **extra,
+        'results': [
+            _serialize(row, paths[origin])
+            for origin, row in zip(origins, page.object_list)
+        ],
+        'next': next_url,
+    })
+
+
+def _posts(request, queryset, **extra):
+    return _feed(request, queryset, POST_FIELDS, 'pub_date', **extra)
+
+
+def index(request):
+    generations.for_request(request, feed_key())
+    return _posts(request, Post.objects.all())
+
+
+def group_posts(request, slug):
+    group = Group.objects.filter(slug=slug).first()
+    if group is None:
+        return _error('Группа не найдена', 404)
+    generations.for_request(request, feed_key(group=group))
+    return _posts(
+        request,
+        Post.objects.filter(group=group),
+        group={
+            'title': group.title,
+            'slug': group.slug,
+            'description': group.description,
+        },
+    )
+
+
+def profile(request, username):
+    author = User.objects.select_related('counters').filter(
+        username=username
+    ).first()
+    if author is None:
+        return _error('Пользователь не найден', 404)
+    generations.for_request(request, feed_key(author=author))
+    counters = user_counters(author)
+    return _posts(
+        request,
+        Post.objects.filter(author=author),
+        author={
+            'username': author.username,
+            'full_name': author.get_full_name(),
+            'posts_count': counters.posts_count,
+            'followers_count': counters.followers_count,
+            'following_count': counters.following_count,
+        },
+    )
+
+
+def follow_index(request):
+    # у каждого своя лента, поэтому ответ не попадает в общий кеш
+    if not request.user.is_authenticated:
+        return _error('Нужно войти', 401)
+    entries, celebrities = timeline.follow_sources(request.user)
+    return _feed(
+        request,
+        entries,
+        POST_FIELDS,
+        'pub_date',
+        pk_field='post_id',
+        prefix='post',
+        merge=celebrities,
+    )
+
+
+def post_detail(request, post_id):
+    try:
+        fields = _fields(request, POST_FIELDS)
+    except InvalidFields as error:
+        return _error(str(error), 400)
+    paths = _paths(fields, POST_FIELDS)
+    row = Post.objects.filter(pk=post_id).values(
+        'author_id', 'group_id', *paths.values()
+    ).first()
+    if row is None:
+        return _error('Пост не найден', 404)
+    generations.for_request(request, *generations.post_scopes(
+        SimpleNamespace(
+            pk=post_id, author_id=row['author_id'], group_id=row['group_id']
+        )
+    ))
+    return _json({'post': _serialize(row, paths)})
+
+
+def post_comments(request, post_id):
+    post = Post.objects.filter(pk=post_id).only('author', 'group').first()
+    if post is None:
+        return _error('Пост не найден', 404)
+    generations.for_request(request, *generations.post_scopes(post))
+    return _feed(
+        request,
+        post.comments.all(),
+        COMMENT_FIELDS,
+        'created',
+        per_page=settings.COMMENTS_PER_PAGE,
+    )
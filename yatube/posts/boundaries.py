@@ -0,0 +1,181 @@
+"""Индекс границ страниц для лент постов.
+
+Граница номер k хранит ключ (pub_date, id) поста, стоящего k * MAX_POSTS-м
+от начала ленты, если считать от самого старого поста. Новые посты
+добавляются в голову ленты и границы не сдвигают; при удалении или
+переносе поста сдвигаются только границы выше него — одним UPDATE на
+ленту, сколько бы границ ни было.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q, Subquery
+
+from .models import Group, PageBoundary, Post
+
+FEED_ALL = 'all'
+
+
+def feed_key(group=None, author=None):
+    if group is not None:
+        return f'group:{group.pk}'
+    if author is not None:
+        return f'author:{author.pk}'
+    return FEED_ALL
+
+
+def feed_queryset(feed):
+    if feed == FEED_ALL:
+        return Post.objects.all()
+    kind, pk = feed.split(':')
+    return Post.objects.filter(**{f'{kind}_id': pk})
+
+
+def post_feeds(post, group_id=None):
+    feeds = [FEED_ALL, f'author:{post.author_id}']
+    if group_id:
+        feeds.append(f'group:{group_id}')
+    return feeds
+
+
+def _before(pub_date, pk, pk_field='pk'):
+    return (
+        Q(pub_date__lt=pub_date)
+        | Q(pub_date=pub_date, **{f'{pk_field}__lt': pk})
+    )
+
+
+def _after(pub_date, pk, pk_field='pk'):
+    return (
+        Q(pub_date__gt=pub_date)
+        | Q(pub_date=pub_date, **{f'{pk_field}__gt': pk})
+    )
+
+
+def _not_before(pub_date, pk, pk_field='pk'):
+    return (
+        Q(pub_date__gt=pub_date)
+        | Q(pub_date=pub_date, **{f'{pk_field}__gte': pk})
+    )
+
+
+def _keys(queryset):
+    return queryset.values_list('pub_date', 'pk')
+
+
+def feed_size(feed, queryset):
+    """Число постов в ленте: не больше одной страницы на подсчёт."""
+    last = PageBoundary.objects.filter(feed=feed).order_by('number').last()
+    if last is None:
+        return None
+    tail = queryset.filter(_not_before(last.pub_date, last.post_id))
+    return last.number * settings.MAX_POSTS + tail.count()
+
+
+def seek(feed, queryset, bottom, top):
+    """Посты ленты с позиции bottom по top (0 — самый новый)."""
+    size = feed_size(feed, queryset)
+    if not size:
+        return None
+    per_page = settings.MAX_POSTS
+    low = max(size - top, 0)
+    high = size - bottom
+    boundary = PageBoundary.objects.filter(
+        feed=feed, number=low // per_page
+    ).first()
+    if boundary is None:
+        return None
+    offset = low - boundary.number * per_page
+    rows = queryset.filter(
+        _not_before(boundary.pub_date, boundary.post_id)
+    ).order_by('pub_date', 'pk')[offset:offset + high - low]
+    return list(rows)[::-1]
+
+
+def _neighbours(feed, following):
+    """Посты ленты рядом с каждой границей: следующие или предыдущие."""
+    outer = (OuterRef('pub_date'), OuterRef('post_id'))
+    if following:
+        return feed_queryset(feed).filter(_after(*outer)).order_by(
+            'pub_date', 'pk'
+        )
+    return feed_queryset(feed).filter(_before(*outer)).order_by(
+        '-pub_date', '-pk'
+    )
+
+
+def _shift(shifted, neighbours):
+    # в SET видны старые значения строки, поэтому обе половины ключа
+    # берутся у одного и того же соседа
+    shifted.update(
+        pub_date=Subquery(neighbours.values('pub_date')[:1]),
+        post_id=Subquery(neighbours.values('pk')[:1]),
+    )
+
+
+@transaction.atomic
+def insert(feed, post):
+    queryset = feed_queryset(feed)
+    _shift(
+        PageBoundary.objects.filter(feed=feed).filter(
+            _after(post.pub_date, post.pk, 'post_id')
+        ),
+        _neighbours(feed, following=False),
+    )
+
+    size = feed_size(feed, queryset)
+    if size is None:
+        rebuild(feed)
+        return
+    if (size - 1) % settings.MAX_POSTS == 0:
+        pub_date, pk = _keys(queryset).order_by('-pub_date', '-pk').first()
+        PageBoundary.objects.create(
+            feed=feed,
+            number=(size - 1) // settings.MAX_POSTS,
+            pub_date=pub_date,
+            post_id=pk,
+        )
+
+
+@transaction.atomic
+def delete(feed, post):
+    successors = _neighbours(feed, following=True)
+    shifted = PageBoundary.objects.filter(feed=feed).filter(
+        _not_before(post.pub_date, post.pk, 'post_id')
+    )
+    # у верхней границы следующего поста нет: она больше не нужна
+    shifted.annotate(
+        has_successor=Exists(successors)
+    ).filter(has_successor=False).delete()
+    _shift(shifted, successors)
+
+
+@transaction.atomic
+def rebuild(feed):
+    PageBoundary.objects.filter(feed=feed).delete()
+    keys = _keys(feed_queryset(feed)).order_by('pub_date', 'pk')
+    boundaries = (
+        PageBoundary(
+            feed=feed,
+            number=position // settings.MAX_POSTS,
+            pub_date=pub_date,
+            post_id=pk,
+        )
+        for position, (pub_date, pk) in enumerate(keys.iterator())
+        if position % settings.MAX_POSTS == 0
+    )
+    PageBoundary.objects.bulk_create(boundaries, batch_size=500)
+
+
+def rebuild_all():
+    """Пересобирает индекс всех лент, возвращает число лент."""
+    feeds = [FEED_ALL]
+    feeds += [f'group:{pk}' for pk in Group.objects.values_list(
+        'pk', flat=True
+    )]
+    feeds += [f'author:{pk}' for pk in Post.objects.values_list(
+        'author_id', flat=True
+    ).order_by().distinct()]
+    PageBoundary.objects.exclude(feed__in=feeds).delete()
+    for feed in feeds:
+        rebuild(feed)
+    return len(feeds)
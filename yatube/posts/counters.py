@@ -0,0 +1,102 @@
+"""Денормализованные счётчики постов, комментариев и подписок."""
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import Comment, Follow, Post, UserCounters
+
+USER_FIELDS = ('posts_count', 'followers_count', 'following_count')
+
+
+def user_counters(user):
+    """Счётчики пользователя; без записи в базе — нулевые."""
+    try:
+        return user.counters
+    except UserCounters.DoesNotExist:
+        return UserCounters(user=user)
+
+
+def followers_count(user_id):
+    return UserCounters.objects.filter(user_id=user_id).values_list(
+        'followers_count', flat=True
+    ).first() or 0
+
+
+def change_user(user_id, **deltas):
+    updated = UserCounters.objects.filter(user_id=user_id).update(**{
+        field: F(field) + delta for field, delta in deltas.items()
+    })
+    # уменьшать отсутствующие счётчики нечего: так бывает при каскадном
+    # удалении самого пользователя
+    if not updated and all(delta > 0 for delta in deltas.values()):
+        UserCounters.objects.create(user_id=user_id, **deltas)
+
+
+def change_post(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=F('comments_count') + delta
+    )
+
+
+def _grouped(queryset, field):
+    return dict(
+        queryset.order_by().values_list(field).annotate(total=Count('pk'))
+    )
+
+
+def actual_user_counters():
+    """Пересчитанные с нуля счётчики: {user_id: {поле: значение}}."""
+    totals = {
+        'posts_count': _grouped(Post.objects, 'author'),
+        'followers_count': _grouped(Follow.objects, 'author'),
+        'following_count': _grouped(Follow.objects, 'user'),
+    }
+    users = set().union(*totals.values())
+    return {
+        user_id: {
+            field: totals[field].get(user_id, 0) for field in USER_FIELDS
+        }
+        for user_id in users
+    }
+
+
+def find_drift():
+    """Расхождения в виде (объект, поле, сохранено, на самом деле)."""
+    drift = []
+    actual = actual_user_counters()
+    stored = {
+        row['user_id']: row
+        for row in UserCounters.objects.values('user_id', *USER_FIELDS)
+    }
+    for user_id in set(actual) | set(stored):
+        for field in USER_FIELDS:
+            expected = actual.get(user_id, {}).get(field, 0)
+            saved = stored.get(user_id, {}).get(field, 0)
+            if expected != saved:
+                drift.append((f'user:{user_id}', field, saved, expected))
+
+    comments = _grouped(Comment.objects, 'post')
+    posts = Post.objects.values_list('pk', 'comments_count').order_by()
+    for post_id, saved in posts.iterator():
+        expected = comments.get(post_id, 0)
+        if expected != saved:
+            drift.append(
+                (f'post:{post_id}', 'comments_count', saved, expected)
+            )
+    return drift
+
+
+@transaction.atomic
+def rebuild():
+    """Пересобирает все счётчики с нуля."""
+    actual = actual_user_counters()
+    UserCounters.objects.all().delete()
+    UserCounters.objects.bulk_create(
+        (
+            UserCounters(user_id=user_id, **values)
+            for user_id, values in actual.items()
+        ),
+        batch_size=500,
+    )
+    Post.objects.update(comments_count=0)
+    for post_id, total in _grouped(Comment.objects, 'post').items():
+        Post.objects.filter(pk=post_id).update(comments_count=total)
@@ -0,0 +1,113 @@
+"""RSS и Atom для общей ленты, групп и авторов.
+
+Ленты отдаются через кеш целых страниц (posts.middleware): представление
+вызывает generations.for_request() с областью своей ленты, поэтому
+повторный опрос до нового поста получает ответ из кеша или 304 по ETag,
+не трогая базу; Last-Modified лентам не отдаётся. В ленте не больше
+settings.FEED_ITEMS последних постов.
+"""
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.text import Truncator
+
+from . import generations
+from .boundaries import FEED_ALL, feed_key
+from .models import Group, Post, User
+
+TITLE_WORDS = 10
+
+
+class PostsFeed(Feed):
+    title = 'Yatube: последние записи'
+    description = 'Последние обновления на сайте'
+
+    def get_object(self, request):
+        generations.for_request(request, FEED_ALL)
+        return None
+
+    def link(self, obj):
+        return reverse('posts:index')
+
+    def posts(self, obj):
+        return Post.objects.select_related('author', 'group')
+
+    def items(self, obj):
+        return self.posts(obj)[:settings.FEED_ITEMS]
+
+    def item_title(self, item):
+        return Truncator(item.text).words(TITLE_WORDS)
+
+    def item_description(self, item):
+        return item.text
+
+    def item_link(self, item):
+        return reverse('posts:post_detail', args=[item.pk])
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+    def item_categories(self, item):
+        return [item.group.title] if item.group else []
+
+
+class GroupFeed(PostsFeed):
+    def get_object(self, request, slug):
+        group = get_object_or_404(Group, slug=slug)
+        generations.for_request(request, feed_key(group=group))
+        return group
+
+    def title(self, obj):
+        return f'Yatube: {obj.title}'
+
+    def description(self, obj):
+        return obj.description
+
+    def link(self, obj):
+        return reverse('posts:group_list', args=[obj.slug])
+
+    def posts(self, obj):
+        return obj.posts.select_related('author', 'group')
+
+
+class AuthorFeed(PostsFeed):
+    def get_object(self, request, username):
+        author = get_object_or_404(User, username=username)
+        generations.for_request(request, feed_key(author=author))
+        return author
+
+    def title(self, obj):
+        return f'Yatube: {obj.get_full_name() or obj.username}'
+
+    def description(self, obj):
+        return f'Записи пользователя {obj.username}'
+
+    def link(self, obj):
+        return reverse('posts:profile', args=[obj.username])
+
+    def posts(self, obj):
+        return obj.posts.select_related('author', 'group')
+
+
+class AtomMixin:
+    feed_type = Atom1Feed
+
+    def subtitle(self, obj):
+        return self._get_dynamic_attr('description', obj)
+
+
+class PostsAtomFeed(AtomMixin, PostsFeed):
+    pass
+
+
+class GroupAtomFeed(AtomMixin, GroupFeed):
+    pass
+
+
+class AuthorAtomFeed(AtomMixin, AuthorFeed):
+    pass
@@ -1,4 +1,5 @@
 from django import forms
+from django.conf import settings
 
 from .models import Post, Comment
 
@@ -16,6 +17,32 @@ class PostForm(forms.ModelForm):
             'group': 'Выберите группу, к которой будет относиться пост',
         }
 
+    def clean_image(self):
+        # большие картинки отсекаются до того, как их кто-то декодирует
+        image = self.cleaned_data.get('image')
+        if not image or not hasattr(image, 'image'):
+            return image
+        if image.size > settings.POST_IMAGE_MAX_SIZE:
+            raise forms.ValidationError(
+                'Картинка больше %(limit)d МБ',
+                params={'limit': settings.POST_IMAGE_MAX_SIZE // 2 ** 20},
+            )
+        width, height = image.image.size
+        if width * height > settings.POST_IMAGE_MAX_PIXELS:
+            raise forms.ValidationError('Слишком большое разрешение картинки')
+        return image
+
+    def save(self, commit=True):
+        if 'image' in self.changed_data:
+            # размеры из заголовка файла; точные вместе с заглушкой
+            # запишет фоновая обработка (posts.images)
+            image = self.cleaned_data.get('image')
+            size = getattr(getattr(image, 'image', None), 'size', None)
+            post = self.instance
+            post.image_width, post.image_height = size or (None, None)
+            post.image_placeholder = ''
+        return super().save(commit)
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
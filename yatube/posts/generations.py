@@ -0,0 +1,67 @@
+"""Поколения содержимого для ключей кеша.
+
+Каждая запись поста, комментария или подписки увеличивает поколение
+затронутых областей: всей ленты, группы, автора и поста. Поколение
+входит в ключи кешированных фрагментов и страниц, поэтому кеш можно
+хранить долго: после записи старые ключи просто перестают читаться.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .boundaries import FEED_ALL
+
+
+def _key(scope):
+    return f'generation:{scope}'
+
+
+def _seed():
+    # после вытеснения счётчик продолжается с нового значения,
+    # а не с единицы, и не совпадает со старыми ключами
+    return time.time_ns()
+
+
+def post_scopes(post, group_id=None):
+    scopes = [FEED_ALL, f'author:{post.author_id}', f'post:{post.pk}']
+    if group_id or post.group_id:
+        scopes.append(f'group:{group_id or post.group_id}')
+    return scopes
+
+
+def get(*scopes):
+    """Текущее поколение набора областей одной строкой."""
+    keys = [_key(scope) for scope in scopes]
+    values = cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        for key in missing:
+            cache.add(key, _seed(), timeout=None)
+        values.update(cache.get_many(missing))
+    return '-'.join(str(values.get(key, 0)) for key in keys)
+
+
+def for_request(request, *scopes):
+    """Как get(), но ещё запоминает области для кеша всей страницы."""
+    request.generation_scopes = scopes
+    request.generation = get(*scopes)
+    return request.generation
+
+
+def bump(*scopes):
+    for scope in set(scopes):
+        try:
+            cache.incr(_key(scope))
+        except ValueError:
+            cache.set(_key(scope), _seed(), timeout=None)
+
+
+def invalidate(*scopes):
+    """Сбрасывает области сейчас и ещё раз после коммита.
+
+    Второй сброс не даёт параллельному запросу закешировать под новым
+    поколением данные, прочитанные до коммита.
+    """
+    bump(*scopes)
+    transaction.on_commit(lambda: bump(*scopes))
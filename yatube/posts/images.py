@@ -0,0 +1,174 @@
+"""Обработка загруженных картинок постов.
+
+После сохранения поста его картинка в фоне уменьшается до
+settings.POST_IMAGE_MAX_DIMENSION по большей стороне и перекодируется:
+в прогрессивный JPEG, а картинки с прозрачностью — в WebP (или PNG, если
+Pillow собран без WebP). При перекодировании теряются EXIF и прочие
+метаданные; поворот из EXIF применяется заранее. GIF не трогаем, чтобы
+не потерять анимацию.
+
+Заодно в пост записываются итоговые размеры картинки и крошечная
+заглушка (data URI), которую страница показывает до загрузки картинки.
+"""
+import base64
+import io
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+from sorl.thumbnail import delete as delete_with_thumbnails
+
+from core import tasks
+
+from . import generations, thumbnails
+from .models import Post
+
+KEEP_FORMATS = ('GIF',)
+
+PLACEHOLDER_SIZE = 16
+PLACEHOLDER_QUALITY = 40
+
+
+def _has_alpha(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+
+
+def placeholder(image):
+    """Размытая копия картинки в несколько сотен байт, как data URI."""
+    small = image.copy()
+    small.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    output = io.BytesIO()
+    small.convert('RGB').save(output, 'JPEG', quality=PLACEHOLDER_QUALITY)
+    data = base64.b64encode(output.getvalue()).decode()
+    return f'data:image/jpeg;base64,{data}'
+
+
+def describe(image):
+    """Поля поста с размерами и заглушкой картинки."""
+    width, height = image.size
+    return {
+        'image_width': width,
+        'image_height': height,
+        'image_placeholder': placeholder(image),
+    }
+
+
+def _encode(image):
+    output = io.BytesIO()
+    if not _has_alpha(image):
+        image.convert('RGB').save(
+            output,
+            'JPEG',
+            quality=settings.POST_IMAGE_QUALITY,
+            optimize=True,
+            progressive=True,
+        )
+        return output.getvalue(), '.jpg'
+    if features.check('webp'):
+        image.convert('RGBA').save(
+            output, 'WEBP', quality=settings.POST_IMAGE_QUALITY
+        )
+        return output.getvalue(), '.webp'
+    image.save(output, 'PNG', optimize=True)
+    return output.getvalue(), '.png'
+
+
+def encode(file):
+    """Перекодированная картинка и её описание.
+
+    Возвращает (байты, расширение, поля describe()); байты и расширение
+    равны None, если картинку нужно оставить как есть.
+    """
+    with Image.open(file) as image:
+        if image.format in KEEP_FORMATS:
+            return None, None, describe(image)
+        image = ImageOps.exif_transpose(image)
+        limit = settings.POST_IMAGE_MAX_DIMENSION
+        image.thumbnail((limit, limit))
+        return (*_encode(image), describe(image))
+
+
+def process(post_id, name):
+    """Перекодирует картинку name поста и ставит в очередь миниатюры."""
+    post = Post.objects.filter(pk=post_id, image=name).only(
+        'author', 'group', 'image'
+    ).first()
+    if post is None:
+        # картинку уже заменили или пост удалён
+        return
+    with post.image.open() as file:
+        content, extension, fields = encode(file)
+    if content is not None:
+        field = post.image.field
+        new_name = field.storage.save(
+            field.generate_filename(post, f'image{extension}'),
+            ContentFile(content),
+        )
+        fields['image'] = new_name
+    if not Post.objects.filter(pk=post_id, image=name).update(**fields):
+        if fields.get('image', name) != name:
+            release(fields['image'])
+        return
+    if fields.get('image', name) != name:
+        # тот же оригинал может сейчас сохранять другой пост в ещё не
+        # закоммиченной транзакции, поэтому с обычной отсрочкой: файл
+        # потом уберёт cleanup_media
+        release(name)
+        post.image.name = fields['image']
+    generations.invalidate(*generations.post_scopes(post))
+    thumbnails.schedule_all(post.image)
+
+
+def measure(post_id, name):
+    """Записывает размеры и заглушку картинки без перекодирования.
+
+    Нужна для постов, сохранённых до появления этих полей.
+    """
+    post = Post.objects.filter(pk=post_id, image=name).only(
+        'author', 'group', 'image'
+    ).first()
+    if post is None:
+        return False
+    with post.image.open() as file, Image.open(file) as image:
+        fields = describe(ImageOps.exif_transpose(image))
+    if not Post.objects.filter(pk=post_id, image=name).update(**fields):
+        return False
+    generations.invalidate(*generations.post_scopes(post))
+    return True
+
+
+def release(name, grace=None):
+    """Удаляет файл картинки, на который больше не ссылаются посты.
+
+    Одинаковые картинки хранятся одним файлом (core.storage), так что
+    число ссылок на файл — это число постов с этим именем картинки.
+    Файлы моложе grace секунд не удаляются: их может как раз сейчас
+    сохранять другой пост; такие файлы потом убирает cleanup_media.
+    """
+    if not name or Post.objects.filter(image=name).exists():
+        return False
+    storage = Post._meta.get_field('image').storage
+    try:
+        if not storage.exists(name):
+            return False
+        modified = storage.get_modified_time(name)
+    except SuspiciousFileOperation:
+        # имя указывает за пределы хранилища: такой файл не наш
+        return False
+    if grace is None:
+        grace = settings.MEDIA_CLEANUP_GRACE
+    age = timezone.now() - modified
+    if age.total_seconds() < grace:
+        return False
+    delete_with_thumbnails(thumbnails.source(name))
+    return True
+
+
+def schedule(post):
+    """Ставит обработку картинки поста в фоновую очередь."""
+    if post.image:
+        tasks.submit(process, post.pk, post.image.name)
@@ -0,0 +1,359 @@
+"""Массовая загрузка постов, комментариев и подписок.
+
+Записи читаются потоком (JSON Lines или CSV) и пишутся порциями: каждая
+порция — одна транзакция с bulk_create. bulk_create не шлёт сигналов,
+поэтому счётчики, индекс границ страниц, ленты подписок и поисковый
+индекс при загрузке не трогаются, а пересобираются одним проходом в
+конце (finish). Авторы и группы находятся по именам через словари в
+памяти; недостающие создаются.
+
+Формат записи (поля CSV называются так же):
+    {"type": "post", "ref": "p1", "author": "leo", "group": "cats",
+     "text": "...", "pub_date": "2022-01-01T10:00:00+00:00"}
+    {"type": "comment", "post": "p1", "author": "ivan", "text": "..."}
+    {"type": "follow", "user": "ivan", "author": "leo"}
+В комментарии post — ref поста из той же загрузки; к уже существующему
+посту комментарий привязывается полем post_id или, как выгружает
+posts.exporter, парой post_author и post_date (автор и дата публикации
+поста). Даты необязательны.
+Поле image поста — имя уже лежащего в хранилище файла (так его выгружает
+posts.exporter); сами файлы команда не копирует.
+
+Id постов и комментариев назначаются здесь же: комментарии должны
+находить посты из той же порции, а даты из записей дописываются по id
+после bulk_create, но SQLite не возвращает id из bulk_create. Поэтому на
+время загрузки никто другой не должен создавать посты и комментарии.
+"""
+import csv
+import json
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, DateTimeField, Max, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import boundaries, counters, generations, search, timeline
+from .boundaries import FEED_ALL
+from .models import Comment, Follow, Group, Post, User
+
+CHUNK_SIZE = 1000
+BATCH_SIZE = 500
+# у SQLite не больше 999 параметров на запрос, а у CASE их по два на пост
+DATES_BATCH_SIZE = 300
+
+
+class InvalidRecord(ValueError):
+    def __init__(self, number, message):
+        super().__init__(f'запись {number}: {message}')
+
+
+def read_records(stream, fmt='jsonl'):
+    """Записи из потока по одной, с номером строки."""
+    if fmt == 'csv':
+        for number, row in enumerate(csv.DictReader(stream), start=2):
+            yield number, {key: value for key, value in row.items() if value}
+        return
+    for number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            raise InvalidRecord(number, error)
+        if not isinstance(record, dict):
+            raise InvalidRecord(number, 'ожидался объект JSON')
+        yield number, record
+
+
+def _chunks(records, size):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _restore_dates(model, field, dates):
+    """Записывает даты {pk: дата} из записей.
+
+    bulk_create ставит полям с auto_now_add текущее время, поэтому даты
+    из записей пишутся следом одним UPDATE с CASE на порцию.
+    """
+    items = list(dates.items())
+    for start in range(0, len(items), DATES_BATCH_SIZE):
+        batch = items[start:start + DATES_BATCH_SIZE]
+        model.objects.filter(pk__in=[pk for pk, _ in batch]).update(**{
+            field: Case(
+                *(When(pk=pk, then=Value(date)) for pk, date in batch),
+                output_field=DateTimeField(),
+            ),
+        })
+
+
+def _date(number, value):
+    date = parse_datetime(value)
+    if date is None:
+        raise InvalidRecord(number, f'неверная дата {value!r}')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date, timezone.utc)
+    return date
+
+
+def _required(number, record, field):
+    value = record.get(field)
+    if not value:
+        raise InvalidRecord(number, f'нет поля {field}')
+    return value
+
+
+class Importer:
+    def __init__(self, chunk_size=CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.users = {}
+        self.groups = {}
+        self.posts = {}
+        self.created = {'post': 0, 'comment': 0, 'follow': 0}
+        # что пересобрать в конце
+        self.authors = set()
+        self.readers = set()
+        self.followed = set()
+        self.touched_groups = set()
+        self.touched_posts = set()
+
+    def _resolve_users(self, usernames):
+        missing = set(usernames) - set(self.users)
+        if not missing:
+            return
+        self.users.update(User.objects.filter(
+            username__in=missing
+        ).values_list('username', 'pk'))
+        new = missing - set(self.users)
+        if new:
+            users = [User(username=username) for username in sorted(new)]
+            for user in users:
+                user.set_unusable_password()
+            User.objects.bulk_create(users, batch_size=BATCH_SIZE)
+            self.users.update(User.objects.filter(
+                username__in=new
+            ).values_list('username', 'pk'))
+
+    def _resolve_groups(self, slugs):
+        missing = set(slugs) - set(self.groups)
+        if not missing:
+            return
+        self.groups.update(Group.objects.filter(
+            slug__in=missing
+        ).values_list('slug', 'pk'))
+        new = missing - set(self.groups)
+        if new:
+            Group.objects.bulk_create(
+                [Group(slug=slug, title=slug) for slug in sorted(new)],
+                batch_size=BATCH_SIZE,
+            )
+            self.groups.update(Group.objects.filter(
+                slug__in=new
+            ).values_list('slug', 'pk'))
+
+    def _load_chunk(self, chunk):
+        kinds = {'post': [], 'comment': [], 'follow': []}
+        for number, record in chunk:
+            kind = record.get('type')
+            if kind not in kinds:
+                raise InvalidRecord(number, f'неизвестный тип {kind!r}')
+            kinds[kind].append((number, record))
+
+        self._resolve_users(
+            record[field]
+            for _, record in chunk
+            for field in ('author', 'user')
+            if record.get(field)
+        )
+        self._resolve_groups(
+            record['group'] for _, record in kinds['post']
+            if record.get('group')
+        )
+
+        created = (
+            self._insert_posts(kinds['post']),
+            self._insert_comments(kinds['comment']),
+            self._insert_follows(kinds['follow']),
+        )
+        for kind, count in zip(kinds, created):
+            self.created[kind] += count
+
+    def _insert_posts(self, records):
+        next_id = (Post.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+        posts = []
+        dates = {}
+        for number, record in records:
+            post = Post(
+                pk=next_id,
+                author_id=self.users[_required(number, record, 'author')],
+                group_id=self.groups.get(record.get('group')),
+                text=_required(number, record, 'text'),
+                image=record.get('image') or '',
+            )
+            if record.get('pub_date'):
+                dates[post.pk] = _date(number, record['pub_date'])
+            next_id += 1
+            if record.get('ref'):
+                self.posts[str(record['ref'])] = post.pk
+            self.authors.add(post.author_id)
+            if post.group_id:
+                self.touched_groups.add(post.group_id)
+            posts.append(post)
+        Post.objects.bulk_create(posts, batch_size=BATCH_SIZE)
+        _restore_dates(Post, 'pub_date', dates)
+        return len(posts)
+
+    @staticmethod
+    def _post_date(number, record):
+        return _date(number, _required(number, record, 'post_date'))
+
+    def _find_posts(self, records):
+        """Существующие посты, на которые ссылаются комментарии.
+
+        Ключи — id из post_id и пары (автор, дата публикации).
+        """
+        ids = set()
+        wanted = set()
+        for number, record in records:
+            if record.get('post_id'):
+                try:
+                    ids.add(int(record['post_id']))
+                except (TypeError, ValueError):
+                    raise InvalidRecord(number, 'неверный post_id')
+            elif record.get('post_author'):
+                wanted.add(
+                    (record['post_author'], self._post_date(number, record))
+                )
+        found = {
+            pk: pk for pk in Post.objects.filter(
+                pk__in=ids
+            ).values_list('pk', flat=True)
+        } if ids else {}
+        if not wanted:
+            return found
+        posts = Post.objects.filter(
+            author__username__in={author for author, _ in wanted},
+            pub_date__in={date for _, date in wanted},
+        ).values_list('author__username', 'pub_date', 'pk')
+        for author, date, pk in posts:
+            # два поста автора с одной датой — ссылка неоднозначна
+            found[author, date] = None if (author, date) in found else pk
+        return found
+
+    def _post_id(self, number, record, found):
+        if record.get('post_id'):
+            post_id = found.get(int(record['post_id']))
+        elif record.get('post_author'):
+            post_id = found.get(
+                (record['post_author'], self._post_date(number, record))
+            )
+        else:
+            return self.posts.get(str(record.get('post')))
+        if post_id is not None:
+            self.touched_posts.add(post_id)
+        return post_id
+
+    def _insert_comments(self, records):
+        found = self._find_posts(records)
+        next_id = (
+            Comment.objects.aggregate(last=Max('pk'))['last'] or 0
+        ) + 1
+        comments = []
+        dates = {}
+        for number, record in records:
+            post_id = self._post_id(number, record, found)
+            if post_id is None:
+                raise InvalidRecord(number, 'пост комментария не найден')
+            comment = Comment(
+                pk=next_id,
+                post_id=post_id,
+                author_id=self.users[_required(number, record, 'author')],
+                text=_required(number, record, 'text'),
+            )
+            if record.get('created'):
+                dates[comment.pk] = _date(number, record['created'])
+            next_id += 1
+            comments.append(comment)
+        Comment.objects.bulk_create(comments, batch_size=BATCH_SIZE)
+        _restore_dates(Comment, 'created', dates)
+        return len(comments)
+
+    def _insert_follows(self, records):
+        follows = []
+        for number, record in records:
+            user_id = self.users[_required(number, record, 'user')]
+            author_id = self.users[_required(number, record, 'author')]
+            if user_id == author_id:
+                continue
+            self.readers.add(user_id)
+            self.followed.add(author_id)
+            follows.append(Follow(user_id=user_id, author_id=author_id))
+        if not follows:
+            return 0
+        # уже существующие подписки bulk_create молча пропускает
+        existing = Follow.objects.filter(
+            user_id__in={follow.user_id for follow in follows}
+        )
+        before = existing.count()
+        Follow.objects.bulk_create(
+            follows, batch_size=BATCH_SIZE, ignore_conflicts=True
+        )
+        return existing.count() - before
+
+    def load(self, records):
+        """Пишет записи порциями, по транзакции на порцию."""
+        for chunk in _chunks(records, self.chunk_size):
+            try:
+                with transaction.atomic():
+                    self._load_chunk(chunk)
+            except IntegrityError as error:
+                # например, пост комментария удалили во время загрузки
+                raise InvalidRecord(
+                    chunk[0][0], f'порция не записана: {error}'
+                )
+
+    def finish(self):
+        """Пересобирает производные данные после загрузки."""
+        counters.rebuild()
+        for feed in [FEED_ALL] + [
+            f'group:{pk}' for pk in self.touched_groups
+        ] + [f'author:{pk}' for pk in self.authors]:
+            boundaries.rebuild(feed)
+        readers = set(Follow.objects.filter(
+            author_id__in=self.authors
+        ).values_list('user_id', flat=True)) | self.readers
+        for reader in User.objects.filter(pk__in=readers).iterator():
+            timeline.rebuild(reader)
+        search.rebuild()
+        generations.invalidate(
+            FEED_ALL,
+            *(f'author:{pk}'
+              for pk in self.authors | self.readers | self.followed),
+            *(f'group:{pk}' for pk in self.touched_groups),
+        )
+        # у старых постов с новыми комментариями изменился их счётчик
+        posts = Post.objects.filter(pk__in=self.touched_posts).only(
+            'author', 'group'
+        )
+        for post in posts.iterator():
+            generations.invalidate(*generations.post_scopes(post))
+
+
+def import_records(records, chunk_size=CHUNK_SIZE):
+    """Загружает записи и пересобирает производные данные.
+
+    Если запись оказалась неверной, уже загруженные порции остаются,
+    и производные данные для них всё равно пересобираются.
+    """
+    importer = Importer(chunk_size)
+    try:
+        importer.load(records)
+    finally:
+        importer.finish()
+    return importer.created
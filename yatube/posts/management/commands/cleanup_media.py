@@ -0,0 +1,44 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from posts import images
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Удаляет файлы картинок, на которые не ссылается ни один пост'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать лишние файлы, ничего не удаляя',
+        )
+
+    def walk(self, storage, path):
+        directories, files = storage.listdir(path)
+        for name in files:
+            yield os.path.join(path, name)
+        for directory in directories:
+            yield from self.walk(storage, os.path.join(path, directory))
+
+    def handle(self, *args, **options):
+        field = Post._meta.get_field('image')
+        if not field.storage.exists(field.upload_to):
+            return
+        referenced = set(
+            Post.objects.exclude(image='').values_list('image', flat=True)
+        )
+        deleted = 0
+        for name in self.walk(field.storage, field.upload_to):
+            if name in referenced:
+                continue
+            if options['dry_run']:
+                self.stdout.write(name)
+            elif images.release(name):
+                deleted += 1
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(
+                f'Удалено файлов: {deleted}'
+            ))
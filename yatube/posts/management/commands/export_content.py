@@ -0,0 +1,36 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import exporter
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = 'Выгружает посты и комментарии автора (JSON Lines, CSV или zip)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument(
+            '--format', choices=tuple(exporter.FORMATS), default='jsonl'
+        )
+        parser.add_argument(
+            '--output', default='-', help='Файл выгрузки или - для stdout'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            author = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(
+                f'Пользователь {options["username"]} не найден'
+            )
+        if options['output'] == '-':
+            self.write(author, options['format'], sys.stdout.buffer)
+            return
+        with open(options['output'], 'wb') as output:
+            self.write(author, options['format'], output)
+
+    def write(self, author, fmt, output):
+        for chunk in exporter.export(author, fmt):
+            output.write(chunk)
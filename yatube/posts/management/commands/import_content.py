@@ -0,0 +1,56 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import importer
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает посты, комментарии и подписки из JSON Lines или CSV '
+        'и пересобирает счётчики, ленты и поисковый индекс'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл с записями или - для stdin')
+        parser.add_argument(
+            '--format',
+            choices=('jsonl', 'csv'),
+            help='Формат записей; по умолчанию — по расширению файла',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=importer.CHUNK_SIZE,
+            help='Сколько записей писать одной транзакцией',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format']
+        if fmt is None:
+            extension = os.path.splitext(path)[1].lower()
+            fmt = 'csv' if extension == '.csv' else 'jsonl'
+        if path == '-':
+            stream = sys.stdin
+        else:
+            try:
+                stream = open(path, encoding='utf-8', newline='')
+            except OSError as error:
+                raise CommandError(error)
+        try:
+            created = importer.import_records(
+                importer.read_records(stream, fmt), options['chunk_size']
+            )
+        except importer.InvalidRecord as error:
+            raise CommandError(
+                f'{error}; загруженное до неё сохранено'
+            )
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        self.stdout.write(self.style.SUCCESS(
+            'Загружено постов: {post}, комментариев: {comment}, '
+            'подписок: {follow}'.format(**created)
+        ))
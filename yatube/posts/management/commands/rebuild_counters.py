@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверяет счётчики постов, комментариев и подписок '
+        'и пересобирает их'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только найти расхождения, ничего не меняя',
+        )
+
+    def handle(self, *args, **options):
+        drift = counters.find_drift()
+        for target, field, saved, expected in drift:
+            self.stdout.write(
+                f'{target} {field}: '
+                f'сохранено {saved}, на самом деле {expected}'
+            )
+        if options['check']:
+            if drift:
+                raise CommandError(f'Расхождений в счётчиках: {len(drift)}')
+            self.stdout.write(self.style.SUCCESS('Счётчики в порядке'))
+            return
+        counters.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Счётчики пересобраны, исправлено расхождений: {len(drift)}'
+        ))
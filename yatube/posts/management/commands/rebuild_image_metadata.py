@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from posts import images
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Записывает размеры и заглушки картинок постов, где их нет'
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').filter(
+            image_width__isnull=True
+        ).values_list('pk', 'image')
+        count = 0
+        for post_id, name in posts.iterator():
+            try:
+                count += images.measure(post_id, name)
+            except (OSError, ValueError) as error:
+                self.stderr.write(f'{name}: {error}')
+        self.stdout.write(self.style.SUCCESS(f'Описано картинок: {count}'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts import boundaries
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает индекс границ страниц для всех лент постов'
+
+    def handle(self, *args, **options):
+        feeds = boundaries.rebuild_all()
+        self.stdout.write(self.style.SUCCESS(
+            f'Индекс границ страниц пересобран для лент: {feeds}'
+        ))
@@ -0,0 +1,233 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, patch_vary_headers,
+)
+from django.utils.http import quote_etag
+
+from core import shells
+
+from . import generations
+
+# с этими куками страница может зависеть от посетителя
+PRIVATE_COOKIES = ('messages',)
+
+
+class PageCacheMiddleware:
+    """Основа кеша целых страниц.
+
+    Кешируются только ответы представлений, вызвавших
+    generations.for_request(). Ключ ответа состоит из адреса страницы и
+    поколений её областей; сами области запоминаются отдельно по адресу,
+    как заголовки Vary у django.middleware.cache. Из тех же поколений
+    строится ETag, так что условный запрос получает 304 раньше, чем
+    страница прочитана из кеша или отрисована.
+    """
+
+    prefix = 'page'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.timeout = settings.PAGE_CACHE_TIMEOUT
+
+    def __call__(self, request):
+        if not self._cacheable(request):
+            return self.get_response(request)
+        response = self._respond(request)
+        if response is not None:
+            return response
+
+        self.prepare(request)
+        response = self.get_response(request)
+        if response.streaming:
+            return response
+        storable = self._storable(request, response)
+        if storable:
+            self._store(request, response)
+        response = self.fill(request, response)
+        if not storable:
+            return response
+        return self._finish(
+            request, response, self._etag(request, request.generation)
+        )
+
+    def prepare(self, request):
+        """Подготовка запроса перед вызовом представления."""
+
+    def fill(self, request, response):
+        """Ответ, готовый для отправки посетителю."""
+        return response
+
+    def _cached_generation(self, request):
+        """Поколение страницы, если её области уже известны."""
+        scopes = cache.get(f'{self.prefix}.scopes.{self._url(request)}')
+        if scopes is None:
+            return None
+        return generations.get(*scopes)
+
+    def _load(self, request, generation):
+        return cache.get(self._page_key(request, generation))
+
+    def _store(self, request, response):
+        url = self._url(request)
+        cache.set(
+            f'{self.prefix}.scopes.{url}',
+            request.generation_scopes,
+            self.timeout,
+        )
+        cache.set(
+            self._page_key(request, request.generation),
+            self._dump(response),
+            self.timeout,
+        )
+
+    def _storable(self, request, response):
+        return (
+            request.method == 'GET'
+            and response.status_code == 200
+            and hasattr(request, 'generation_scopes')
+        )
+
+    def _url(self, request):
+        return hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+
+    def _page_key(self, request, generation):
+        return f'{self.prefix}.{self._url(request)}.{generation}'
+
+    def _dump(self, response):
+        # в кеш кладутся неизменяемые данные, а не сам объект ответа:
+        # из памяти процесса его получили бы сразу несколько запросов
+        return response.content, tuple(response.items())
+
+    def _restore(self, page):
+        content, headers = page
+        response = HttpResponse(content)
+        for header, value in headers:
+            response[header] = value
+        return response
+
+    def _etag(self, request, generation):
+        return quote_etag(hashlib.md5(
+            f'{self.prefix}.{generation}'.encode()
+        ).hexdigest())
+
+    def _cache_control(self, response):
+        patch_cache_control(
+            response, public=True, max_age=settings.PAGE_MAX_AGE
+        )
+
+    def _finish(self, request, response, etag):
+        """Проставляет валидатор и отвечает 304, если он совпал."""
+        response['ETag'] = etag
+        self._cache_control(response)
+        patch_vary_headers(response, ('Cookie',))
+        # Last-Modified лент RSS и Atom — дата самого нового поста: она
+        # не меняется при правке и уходит назад при удалении, поэтому
+        # валидатором служит только ETag поколения
+        del response['Last-Modified']
+        return get_conditional_response(
+            request, etag=etag, response=response
+        )
+
+    def _respond(self, request):
+        """Ответ по закешированной странице, без представления."""
+        generation = self._cached_generation(request)
+        if generation is None:
+            return None
+        etag = self._etag(request, generation)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            page = self._load(request, generation)
+            if page is None:
+                return None
+            response = self.fill(request, self._restore(page))
+        return self._finish(request, response, etag)
+
+
+class AnonymousPageCacheMiddleware(PageCacheMiddleware):
+    """Кеш целых страниц для анонимных посетителей.
+
+    Запросы с кукой сессии идут мимо кеша, поэтому middleware стоит до
+    SessionMiddleware и при попадании не трогает ни сессию, ни
+    пользователя.
+    """
+
+    def _cacheable(self, request):
+        if request.method not in ('GET', 'HEAD'):
+            return False
+        cookies = (settings.SESSION_COOKIE_NAME,) + PRIVATE_COOKIES
+        return not any(name in request.COOKIES for name in cookies)
+
+    def _storable(self, request, response):
+        user = getattr(request, 'user', None)
+        return (
+            super()._storable(request, response)
+            and not response.cookies
+            and not (user is not None and user.is_authenticated)
+        )
+
+
+class PageShellMiddleware(PageCacheMiddleware):
+    """Общие заготовки страниц для вошедших пользователей.
+
+    Страница рендерится с отметками вместо персональных частей, а в
+    кеш кладётся заготовка — одна на всех. В каждом ответе отметки
+    заполняются для текущего пользователя (core.shells.fill), поэтому
+    middleware стоит после AuthenticationMiddleware и CsrfViewMiddleware.
+    """
+
+    prefix = 'shell'
+
+    def _cacheable(self, request):
+        return (
+            request.method in ('GET', 'HEAD')
+            and request.user.is_authenticated
+        )
+
+    def prepare(self, request):
+        request.page_shell = shells.Shell()
+
+    def fill(self, request, response):
+        # заполняются только страницы, отрисованные заготовкой с
+        # отметками; JSON и прочие ответы отдаются как есть
+        shell = getattr(response, 'page_shell', None) or getattr(
+            request, 'page_shell', None
+        )
+        if (
+            shell is None
+            or not shell.parts
+            or not response.get('Content-Type', '').startswith('text/html')
+        ):
+            return response
+        response.content = shell.fill(
+            response.content.decode(response.charset), request
+        )
+        return response
+
+    def _store(self, request, response):
+        response.page_shell = request.page_shell
+        super()._store(request, response)
+
+    def _dump(self, response):
+        # персональные части хранятся вместе с заготовкой
+        shell = response.page_shell
+        return super()._dump(response) + (shell.nonce, tuple(shell.parts))
+
+    def _restore(self, page):
+        content, headers, nonce, parts = page
+        response = super()._restore((content, headers))
+        response.page_shell = shells.Shell(nonce, parts)
+        return response
+
+    def _etag(self, request, generation):
+        # персональные части зависят от пользователя и его CSRF-куки
+        csrf = request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')
+        return super()._etag(
+            request, f'{generation}.{request.user.pk}.{csrf}'
+        )
+
+    def _cache_control(self, response):
+        patch_cache_control(response, private=True, no_cache=True)
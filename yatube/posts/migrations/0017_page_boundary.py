@@ -0,0 +1,59 @@
+# Generated by Django 2.2.16 on 2026-10-17 05:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def build_boundaries(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    PageBoundary = apps.get_model('posts', 'PageBoundary')
+    per_page = settings.MAX_POSTS
+    feeds = {'all': Post.objects.all()}
+    for author_id, group_id in Post.objects.values_list(
+        'author_id', 'group_id'
+    ).distinct():
+        feeds[f'author:{author_id}'] = Post.objects.filter(author_id=author_id)
+        if group_id:
+            feeds[f'group:{group_id}'] = Post.objects.filter(group_id=group_id)
+    for feed, posts in feeds.items():
+        keys = posts.order_by('pub_date', 'pk').values_list('pub_date', 'pk')
+        PageBoundary.objects.bulk_create(
+            PageBoundary(
+                feed=feed,
+                number=position // per_page,
+                pub_date=pub_date,
+                post_id=pk,
+            )
+            for position, (pub_date, pk) in enumerate(keys.iterator())
+            if position % per_page == 0
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_auto_20220225_1415'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PageBoundary',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('feed', models.CharField(max_length=50)),
+                ('number', models.PositiveIntegerField()),
+                ('pub_date', models.DateTimeField()),
+                ('post_id', models.PositiveIntegerField()),
+            ],
+            options={
+                'verbose_name': 'Граница страницы',
+                'verbose_name_plural': 'Границы страниц',
+                'ordering': ('feed', 'number'),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='pageboundary',
+            constraint=models.UniqueConstraint(fields=('feed', 'number'), name='unique_page_boundary'),
+        ),
+        migrations.RunPython(build_boundaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 2.2.16 on 2026-10-17 05:59
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def fill_counters(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    UserCounters = apps.get_model('posts', 'UserCounters')
+
+    def grouped(model, field):
+        return model.objects.order_by().values_list(field).annotate(
+            total=Count('pk')
+        )
+
+    counters = {}
+    for model, field, counter in (
+        (Post, 'author', 'posts_count'),
+        (Follow, 'author', 'followers_count'),
+        (Follow, 'user', 'following_count'),
+    ):
+        for user_id, total in grouped(model, field):
+            counters.setdefault(user_id, {})[counter] = total
+    UserCounters.objects.bulk_create(
+        UserCounters(user_id=user_id, **values)
+        for user_id, values in counters.items()
+    )
+    for post_id, total in grouped(Comment, 'post'):
+        Post.objects.filter(pk=post_id).update(comments_count=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0018_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserCounters',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='counters', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('posts_count', models.PositiveIntegerField(default=0)),
+                ('followers_count', models.PositiveIntegerField(default=0)),
+                ('following_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Счётчики пользователя',
+                'verbose_name_plural': 'Счётчики пользователей',
+            },
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
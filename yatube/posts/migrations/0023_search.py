@@ -0,0 +1,31 @@
+from django.db import migrations
+
+TOKENIZE = "tokenize = 'unicode61 remove_diacritics 2'"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0022_image_metadata'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            [
+                f'CREATE VIRTUAL TABLE posts_post_fts USING fts5('
+                f'text, {TOKENIZE})',
+                'INSERT INTO posts_post_fts (rowid, text) '
+                'SELECT id, text FROM posts_post',
+            ],
+            'DROP TABLE posts_post_fts',
+        ),
+        migrations.RunSQL(
+            [
+                f'CREATE VIRTUAL TABLE posts_comment_fts USING fts5('
+                f'text, post_id UNINDEXED, {TOKENIZE})',
+                'INSERT INTO posts_comment_fts (rowid, text, post_id) '
+                'SELECT id, text, post_id FROM posts_comment',
+            ],
+            'DROP TABLE posts_comment_fts',
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from core.storage import ContentAddressedStorage
+
 User = get_user_model()
 
 
@@ -34,14 +36,38 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
-        blank=True
+        storage=ContentAddressedStorage(),
+        blank=True,
+        db_index=True,
+    )
+    # размеры и заглушка картинки известны заранее: страницам не нужно
+    # открывать файл, а браузер резервирует место до загрузки
+    image_width = models.PositiveIntegerField(
+        null=True, blank=True, editable=False
     )
+    image_height = models.PositiveIntegerField(
+        null=True, blank=True, editable=False
+    )
+    image_placeholder = models.TextField(blank=True, editable=False)
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ("-pub_date",)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'], name='post_date_idx'),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_date_idx'
+            ),
+        ]
+
     def __str__(self):
         return self.text[:15]
 
@@ -65,6 +91,17 @@ class Comment(models.Model):
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
 
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='comment_post_created_idx'
+            ),
+            # список комментариев в админке
+            models.Index(
+                fields=['-created', '-id'], name='comment_created_idx'
+            ),
+        ]
+
     def __str__(self):
         return self.text[:15]
 
@@ -85,9 +122,99 @@ class Follow(models.Model):
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
 
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx'
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['user', 'author'],
                 name="unique_order"
             )
         ]
+
+
+class TimelineEntry(models.Model):
+    """Пост в ленте подписок читателя, раскладывается при публикации.
+
+    Дата копируется из поста, чтобы лента читалась одним проходом
+    по индексу (user, -pub_date, -post).
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ('-pub_date', '-post')
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Записи лент подписок'
+
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_date_idx'
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry'
+            )
+        ]
+
+
+class UserCounters(models.Model):
+    """Счётчики пользователя, обновляются сигналами Post и Follow."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters'
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return str(self.user)
+
+
+class PageBoundary(models.Model):
+    """Начало каждой страницы ленты, считая от самого старого поста.
+
+    Отсчёт снизу не сдвигается при публикации новых постов, поэтому
+    индекс обновляется точечно, а страница ищется по ключу вместо OFFSET.
+    """
+    feed = models.CharField(max_length=50)
+    number = models.PositiveIntegerField()
+    pub_date = models.DateTimeField()
+    post_id = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ('feed', 'number')
+        verbose_name = 'Граница страницы'
+        verbose_name_plural = 'Границы страниц'
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=['feed', 'number'],
+                name='unique_page_boundary'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.feed}:{self.number}'
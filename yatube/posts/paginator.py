@@ -0,0 +1,288 @@
+import base64
+import binascii
+import heapq
+
+from django.conf import settings
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.http import Http404
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from . import boundaries
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def _encode(direction, number, key, pk):
+    raw = f'{direction}|{number}|{key.isoformat()}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу (дата, id).
+
+    Кроме обычных номеров страниц понимает непрозрачные курсоры:
+    страница по курсору выбирается условием по ключу вместо OFFSET
+    и не требует COUNT(*), поэтому стоит одинаково на любой глубине.
+    Если передан ключ ленты `feed`, номерные страницы и их число берутся
+    из индекса границ страниц (см. posts.boundaries).
+    """
+
+    def __init__(self, object_list, per_page, date_field='pub_date',
+                 pk_field='pk', window=2, feed=None, **kwargs):
+        self.date_field = date_field
+        self.pk_field = pk_field
+        self.window = window
+        self.feed = feed
+        object_list = object_list.order_by(f'-{date_field}', f'-{pk_field}')
+        super().__init__(object_list, per_page, **kwargs)
+
+    def sort_key(self, obj):
+        """Ключ (дата, id) объекта или строки .values()."""
+        if isinstance(obj, dict):
+            return obj[self.date_field], obj[self.pk_field]
+        return getattr(obj, self.date_field), getattr(obj, self.pk_field)
+
+    def encode_cursor(self, obj, number, direction):
+        return _encode(direction, number, *self.sort_key(obj))
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            raw = base64.urlsafe_b64decode(padded.encode()).decode()
+            direction, number, key, pk = raw.split('|')
+            number, pk, key = int(number), int(pk), parse_datetime(key)
+        except (ValueError, TypeError, binascii.Error, UnicodeError):
+            raise InvalidCursor(cursor)
+        if direction not in (NEXT, PREVIOUS) or key is None:
+            raise InvalidCursor(cursor)
+        return direction, max(number, 1), key, pk
+
+    def keyset(self, direction, key, pk):
+        """Объекты после ключа (или перед ним, в обратном порядке)."""
+        field, pk_field = self.date_field, self.pk_field
+        if direction == NEXT:
+            return self.object_list.filter(
+                Q(**{f'{field}__lt': key})
+                | Q(**{field: key, f'{pk_field}__lt': pk})
+            )
+        return self.object_list.filter(
+            Q(**{f'{field}__gt': key})
+            | Q(**{field: key, f'{pk_field}__gt': pk})
+        ).reverse()
+
+    @property
+    def _seekable(self):
+        return self.feed is not None and self.per_page == settings.MAX_POSTS
+
+    @cached_property
+    def count(self):
+        if self._seekable:
+            size = boundaries.feed_size(self.feed, self.object_list)
+            if size is not None:
+                return size
+        return super().count
+
+    def page(self, number):
+        rows = None
+        if self._seekable:
+            number = self.validate_number(number)
+            bottom = (number - 1) * self.per_page
+            rows = boundaries.seek(
+                self.feed, self.object_list, bottom, bottom + self.per_page
+            )
+        if rows is None:
+            page = super().page(number)
+            page.object_list = list(page.object_list)
+        else:
+            page = self._get_page(rows, number, self)
+        self._add_navigation(
+            page,
+            has_previous=page.has_previous(),
+            has_next=page.has_next(),
+        )
+        page.page_window = range(
+            max(1, page.number - self.window),
+            min(self.num_pages, page.number + self.window) + 1,
+        )
+        page.last_number = self.num_pages
+        return page
+
+    def get_cursor_page(self, cursor):
+        """Страница по курсору; при битом курсоре — первая страница."""
+        try:
+            direction, number, key, pk = self.decode_cursor(cursor)
+        except InvalidCursor:
+            return self.get_page(1)
+
+        rows = self.keyset(direction, key, pk)
+        rows = list(rows[:self.per_page + 1])
+        if not rows:
+            return self.get_page(1)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if direction == NEXT:
+            has_previous, has_next = True, has_more
+        else:
+            rows.reverse()
+            has_previous, has_next = has_more, True
+            if not has_more:
+                number = 1
+
+        page = Page(rows, number, self)
+        page.cursor = cursor
+        self._add_navigation(page, has_previous, has_next)
+        page.page_window = range(number, number + 1)
+        page.last_number = None
+        return page
+
+    def get_chunk(self, cursor=None):
+        """Порция для подгрузки «Показать ещё»: только вперёд, без COUNT(*).
+
+        Без курсора или с битым курсором — первая порция.
+        """
+        rows, number = self.object_list, 1
+        try:
+            direction, number, key, pk = self.decode_cursor(cursor or '')
+        except InvalidCursor:
+            direction = None
+        if direction == NEXT:
+            rows = self.keyset(direction, key, pk)
+        else:
+            number = 1
+        rows = list(rows[:self.per_page + 1])
+        page = Page(rows[:self.per_page], number, self)
+        self._add_navigation(
+            page, has_previous=False, has_next=len(rows) > self.per_page
+        )
+        return page
+
+    def _add_navigation(self, page, has_previous, has_next):
+        page.cursor = getattr(page, 'cursor', '')
+        page.previous_cursor = ''
+        page.next_cursor = ''
+        if not page.object_list:
+            return
+        if has_previous:
+            page.previous_cursor = self.encode_cursor(
+                page.object_list[0], page.number - 1, PREVIOUS
+            )
+        if has_next:
+            page.next_cursor = self.encode_cursor(
+                page.object_list[-1], page.number + 1, NEXT
+            )
+
+
+def get_page(request, object_list, per_page=None, **kwargs):
+    """Страница из GET-параметров `cursor` или `page`."""
+    paginator = CursorPaginator(
+        object_list, per_page or settings.MAX_POSTS, **kwargs
+    )
+    cursor = request.GET.get('cursor')
+    if cursor:
+        return paginator.get_cursor_page(cursor)
+    return paginator.get_page(request.GET.get('page'))
+
+
+def get_chunk(request, object_list, per_page, **kwargs):
+    """Порция по GET-параметру `cursor` для подгрузки «Показать ещё»."""
+    paginator = CursorPaginator(object_list, per_page, **kwargs)
+    return paginator.get_chunk(request.GET.get('cursor'))
+
+
+def _merge(paginators, per_page, direction, key, pk):
+    """Первые per_page + 1 разных объектов нескольких лент после ключа.
+
+    Каждая лента читается своим запросом по ключу с LIMIT, а порции
+    сливаются в памяти; пост, который есть в двух лентах, берётся один
+    раз. Возвращает пары (номер ленты, объект) в порядке чтения.
+    """
+    chunks = []
+    for origin, paginator in enumerate(paginators):
+        rows = paginator.object_list
+        if key is not None:
+            rows = paginator.keyset(direction, key, pk)
+        chunks.append([
+            (paginator.sort_key(row), origin, row)
+            for row in rows[:per_page + 1]
+        ])
+    merged, seen = [], set()
+    for row_key, origin, row in heapq.merge(
+        *chunks, key=lambda item: item[0], reverse=direction == NEXT
+    ):
+        if row_key in seen:
+            continue
+        seen.add(row_key)
+        merged.append((row_key, origin, row))
+        if len(merged) > per_page:
+            break
+    return merged
+
+
+def _numbered_page(value):
+    try:
+        return int(value) > 1
+    except (TypeError, ValueError):
+        return False
+
+
+def get_merged_page(request, sources, per_page=None, date_field='pub_date'):
+    """Страница слияния нескольких лент по GET-параметру `cursor`.
+
+    sources — пары (queryset, pk_field), ключ (дата, id) у всех лент
+    общий. Стоит как несколько чтений по индексу, без COUNT(*) и OFFSET,
+    поэтому номерных страниц нет: без курсора — первая страница, а на
+    ?page=N дальше первой — Http404.
+    В page.origins — номер ленты каждого объекта страницы.
+    """
+    per_page = per_page or settings.MAX_POSTS
+    paginators = [
+        CursorPaginator(
+            queryset, per_page, date_field=date_field, pk_field=pk_field
+        )
+        for queryset, pk_field in sources
+    ]
+    try:
+        direction, number, key, pk = paginators[0].decode_cursor(
+            request.GET.get('cursor') or ''
+        )
+    except InvalidCursor:
+        if _numbered_page(request.GET.get('page')):
+            # номерных страниц нет: первая страница вместо запрошенной
+            # показала бы клиенту уже виденные посты
+            raise Http404('Страницы ленты выбираются только курсором')
+        direction, number, key, pk = NEXT, 1, None, None
+    merged = _merge(paginators, per_page, direction, key, pk)
+    if not merged and key is not None:
+        # курсор указывает за конец ленты
+        direction, number, key = NEXT, 1, None
+        merged = _merge(paginators, per_page, direction, key, pk)
+
+    has_more = len(merged) > per_page
+    merged = merged[:per_page]
+    if direction == NEXT:
+        has_previous, has_next = key is not None, has_more
+    else:
+        merged.reverse()
+        has_previous, has_next = has_more, True
+        if not has_more:
+            number = 1
+
+    page = Page([row for _, _, row in merged], number, paginators[0])
+    page.origins = [origin for _, origin, _ in merged]
+    page.cursor = request.GET.get('cursor') or ''
+    page.previous_cursor = page.next_cursor = ''
+    if merged and has_previous:
+        page.previous_cursor = _encode(PREVIOUS, number - 1, *merged[0][0])
+    if merged and has_next:
+        page.next_cursor = _encode(NEXT, number + 1, *merged[-1][0])
+    page.page_window = range(number, number + 1)
+    page.last_number = None
+    return page
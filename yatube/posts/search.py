@@ -0,0 +1,155 @@
+"""Полнотекстовый поиск по постам и комментариям на SQLite FTS5.
+
+Тексты лежат в виртуальных таблицах posts_post_fts и posts_comment_fts,
+где rowid — id поста или комментария, так что сигналы обновляют индекс
+по одной строке, а rebuild() пересобирает его целиком. Каждое слово
+запроса ищется как префикс: это заменяет стемминг для русских окончаний.
+Пост находится и по своему тексту, и по комментариям; совпадения в
+комментариях весят меньше. Результаты упорядочены по bm25 и листаются
+курсором по паре (оценка, id поста).
+"""
+import base64
+import binascii
+import re
+
+from django.core.paginator import Page
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .models import Comment, Post
+
+COMMENT_WEIGHT = 0.5
+MAX_WORDS = 10
+
+WORD = re.compile(r'\w+')
+
+RANKED = '''
+    SELECT post_id, SUM(score) AS score FROM (
+        SELECT rowid AS post_id, bm25(posts_post_fts) AS score
+        FROM posts_post_fts WHERE posts_post_fts MATCH %s
+        UNION ALL
+        SELECT post_id, bm25(posts_comment_fts) * %s AS score
+        FROM posts_comment_fts WHERE posts_comment_fts MATCH %s
+    )
+    GROUP BY post_id
+    {having}
+    ORDER BY score, post_id DESC
+    LIMIT %s
+'''
+AFTER = 'HAVING score > %s OR (score = %s AND post_id < %s)'
+
+
+def _execute(sql, params=()):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def index_post(post):
+    _execute(
+        'INSERT OR REPLACE INTO posts_post_fts (rowid, text) VALUES (%s, %s)',
+        [post.pk, post.text],
+    )
+
+
+def unindex_post(post_id):
+    _execute('DELETE FROM posts_post_fts WHERE rowid = %s', [post_id])
+
+
+def index_comment(comment):
+    _execute(
+        'INSERT OR REPLACE INTO posts_comment_fts (rowid, text, post_id) '
+        'VALUES (%s, %s, %s)',
+        [comment.pk, comment.text, comment.post_id],
+    )
+
+
+def unindex_comment(comment_id):
+    _execute('DELETE FROM posts_comment_fts WHERE rowid = %s', [comment_id])
+
+
+def rebuild():
+    """Пересобирает индекс по всем постам и комментариям."""
+    _execute('DELETE FROM posts_post_fts')
+    _execute('DELETE FROM posts_comment_fts')
+    _execute(
+        'INSERT INTO posts_post_fts (rowid, text) '
+        'SELECT id, text FROM posts_post'
+    )
+    _execute(
+        'INSERT INTO posts_comment_fts (rowid, text, post_id) '
+        'SELECT id, text, post_id FROM posts_comment'
+    )
+    for table in ('posts_post_fts', 'posts_comment_fts'):
+        _execute(f"INSERT INTO {table} ({table}) VALUES ('optimize')")
+
+
+def match_expression(text):
+    """Запрос FTS5 из слов текста; пустая строка, если слов нет."""
+    words = WORD.findall(text.lower())[:MAX_WORDS]
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def filter_matching(queryset, text):
+    """Посты или комментарии набора, текст которых совпал с запросом."""
+    table = {
+        Post: 'posts_post_fts', Comment: 'posts_comment_fts'
+    }[queryset.model]
+    expression = match_expression(text)
+    if not expression:
+        return queryset.none()
+    return queryset.filter(pk__in=RawSQL(
+        f'SELECT rowid FROM {table} WHERE {table} MATCH %s', [expression]
+    ))
+
+
+def encode_cursor(number, score, post_id):
+    raw = f'{number}|{score!r}|{post_id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(номер страницы, оценка, id поста) или None для битого курсора."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        number, score, post_id = raw.split('|')
+        return max(int(number), 1), float(score), int(post_id)
+    except (ValueError, TypeError, binascii.Error, UnicodeError):
+        return None
+
+
+def search(text, per_page, cursor=None):
+    """Страница найденных постов, лучшие совпадения первыми.
+
+    У страницы есть cursor и next_cursor, как у CursorPaginator;
+    общего числа результатов она не знает.
+    """
+    expression = match_expression(text)
+    after = decode_cursor(cursor) if cursor else None
+    number = 1
+    rows = []
+    if expression:
+        having, params = '', []
+        if after is not None:
+            number, score, post_id = after
+            having, params = AFTER, [score, score, post_id]
+        rows = _execute(
+            RANKED.format(having=having),
+            [expression, COMMENT_WEIGHT, expression, *params, per_page + 1],
+        )
+    found = Post.objects.select_related('author', 'group').in_bulk(
+        [post_id for post_id, _ in rows[:per_page]]
+    )
+    page = Page(
+        [found[post_id] for post_id, _ in rows[:per_page]
+         if post_id in found],
+        number,
+        None,
+    )
+    page.cursor = cursor if after is not None else ''
+    page.next_cursor = ''
+    if len(rows) > per_page:
+        post_id, score = rows[per_page - 1]
+        page.next_cursor = encode_cursor(number + 1, score, post_id)
+    return page
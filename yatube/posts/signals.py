@@ -0,0 +1,223 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import (
+    boundaries, counters, generations, images, search, timeline,
+)
+from .boundaries import FEED_ALL
+from .models import Comment, Follow, Group, PageBoundary, Post, User
+
+# поля пользователя, которые выводятся на страницах постов
+USER_NAME_FIELDS = ('username', 'first_name', 'last_name')
+
+
+@receiver(pre_save, sender=Post)
+def remember_old_values(sender, instance, **kwargs):
+    """Запоминает группу, автора и картинку поста до сохранения."""
+    old = None
+    if instance.pk:
+        old = Post.objects.filter(pk=instance.pk).values_list(
+            'group_id', 'author_id', 'image'
+        ).first()
+    (
+        instance._old_group_id,
+        instance._old_author_id,
+        instance._old_image,
+    ) = old or (None, None, None)
+
+
+@receiver(post_save, sender=Post)
+def update_post_feeds_on_save(sender, instance, created, raw=False,
+                              **kwargs):
+    if raw:
+        return
+    if created:
+        counters.change_user(instance.author_id, posts_count=1)
+        for feed in boundaries.post_feeds(instance, instance.group_id):
+            boundaries.insert(feed, instance)
+        timeline.fan_out(instance)
+        return
+    old_group_id = getattr(instance, '_old_group_id', None)
+    if old_group_id != instance.group_id:
+        if old_group_id:
+            boundaries.delete(f'group:{old_group_id}', instance)
+        if instance.group_id:
+            boundaries.insert(f'group:{instance.group_id}', instance)
+    # автора поста можно сменить в админке
+    old_author_id = getattr(instance, '_old_author_id', None)
+    if old_author_id and old_author_id != instance.author_id:
+        counters.change_user(old_author_id, posts_count=-1)
+        counters.change_user(instance.author_id, posts_count=1)
+        boundaries.delete(f'author:{old_author_id}', instance)
+        boundaries.insert(f'author:{instance.author_id}', instance)
+        timeline.reassign(instance)
+
+
+@receiver(post_delete, sender=Post)
+def update_post_feeds_on_delete(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, posts_count=-1)
+    for feed in boundaries.post_feeds(instance, instance.group_id):
+        boundaries.delete(feed, instance)
+
+
+@receiver(post_delete, sender=Group)
+def drop_group_boundaries(sender, instance, **kwargs):
+    PageBoundary.objects.filter(
+        feed=boundaries.feed_key(group=instance)
+    ).delete()
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_post(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    counters.change_post(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def update_on_follow(sender, instance, created, raw=False, **kwargs):
+    if not created or raw:
+        return
+    counters.change_user(instance.author_id, followers_count=1)
+    counters.change_user(instance.user_id, following_count=1)
+    if not timeline.is_celebrity(instance.author_id):
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def update_on_unfollow(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, followers_count=-1)
+    counters.change_user(instance.user_id, following_count=-1)
+    timeline.drop(instance.user_id, instance.author_id)
+    followers = counters.followers_count(instance.author_id)
+    if followers == settings.TIMELINE_FANOUT_LIMIT:
+        timeline.backfill_followers(instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    old_author_id = getattr(instance, '_old_author_id', None)
+    generations.invalidate(
+        *generations.post_scopes(instance),
+        *generations.post_scopes(
+            instance, getattr(instance, '_old_group_id', None)
+        ),
+        *([f'author:{old_author_id}'] if old_author_id else []),
+    )
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment(sender, instance, raw=False, **kwargs):
+    # число комментариев показывается и в лентах, поэтому сбрасываются
+    # все области поста
+    if raw:
+        return
+    post = Post.objects.filter(pk=instance.post_id).only(
+        'author_id', 'group_id'
+    ).first()
+    if post is not None:
+        generations.invalidate(*generations.post_scopes(post))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow(sender, instance, raw=False, **kwargs):
+    if not raw:
+        generations.invalidate(
+            f'author:{instance.author_id}', f'author:{instance.user_id}'
+        )
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group(sender, instance, raw=False, **kwargs):
+    # название группы выводится и в общей ленте
+    if not raw:
+        generations.invalidate(FEED_ALL, boundaries.feed_key(group=instance))
+
+
+@receiver(pre_save, sender=User)
+def remember_old_name(sender, instance, update_fields=None, **kwargs):
+    """Запоминает имя пользователя до сохранения."""
+    instance._old_name = None
+    if not instance.pk or (
+        update_fields is not None
+        and not set(update_fields) & set(USER_NAME_FIELDS)
+    ):
+        # например, вход обновляет только last_login
+        return
+    instance._old_name = User.objects.filter(pk=instance.pk).values_list(
+        *USER_NAME_FIELDS
+    ).first()
+
+
+@receiver(post_save, sender=User)
+def invalidate_author(sender, instance, created, raw=False, **kwargs):
+    # имя автора выводится во всех лентах с его постами, а username —
+    # ещё и в комментариях
+    old = getattr(instance, '_old_name', None)
+    if raw or created or old is None:
+        return
+    new = tuple(getattr(instance, field) for field in USER_NAME_FIELDS)
+    if old == new:
+        return
+    scopes = {FEED_ALL, f'author:{instance.pk}'}
+    posts = Post.objects.filter(author=instance).values_list(
+        'pk', 'group_id'
+    )
+    for pk, group_id in posts.iterator():
+        scopes.add(f'post:{pk}')
+        if group_id:
+            scopes.add(f'group:{group_id}')
+    if old[0] != instance.username:
+        commented = Comment.objects.filter(author=instance).values_list(
+            'post_id', flat=True
+        ).distinct()
+        scopes.update(f'post:{pk}' for pk in commented.iterator())
+    generations.invalidate(*scopes)
+
+
+@receiver(post_save, sender=Post)
+def release_replaced_image(sender, instance, created, raw=False, **kwargs):
+    old_image = getattr(instance, '_old_image', None)
+    if not raw and old_image and old_image != instance.image.name:
+        transaction.on_commit(lambda: images.release(old_image))
+
+
+@receiver(post_delete, sender=Post)
+def release_deleted_image(sender, instance, **kwargs):
+    if instance.image:
+        name = instance.image.name
+        transaction.on_commit(lambda: images.release(name))
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.unindex_post(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def index_comment(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_comment(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_comment(sender, instance, **kwargs):
+    search.unindex_comment(instance.pk)
@@ -0,0 +1,12 @@
+from django import template
+
+from ..models import Follow
+
+register = template.Library()
+
+
+@register.filter
+def is_following(user, author_id):
+    if not user.is_authenticated:
+        return False
+    return Follow.objects.filter(user=user, author_id=author_id).exists()
@@ -0,0 +1,19 @@
+from django import template
+
+from .. import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def preload_thumbnails(posts):
+    """Находит миниатюры всех постов страницы разом; ничего не выводит."""
+    thumbnails.preload(posts)
+    return ''
+
+
+@register.simple_tag
+def post_thumbnail(post):
+    if not hasattr(post, 'thumbnail'):
+        thumbnails.preload([post])
+    return post.thumbnail
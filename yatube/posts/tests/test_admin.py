@@ -0,0 +1,105 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import admin as posts_admin
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class AdminTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        cls.group = Group.objects.create(title='Группа', slug='group')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def create_posts(self, count):
+        for number in range(count):
+            post = Post.objects.create(
+                author=self.admin, text=f'Пост {number}', group=self.group
+            )
+            Comment.objects.create(
+                post=post, author=self.admin, text=f'Комментарий {number}'
+            )
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelists_cost_does_not_grow_with_rows(self):
+        urls = [
+            reverse('admin:posts_post_changelist'),
+            reverse('admin:posts_comment_changelist'),
+            reverse('admin:posts_follow_changelist'),
+        ]
+        self.create_posts(2)
+        before = [self.count_queries(url) for url in urls]
+        self.create_posts(5)
+        self.assertEqual([self.count_queries(url) for url in urls], before)
+
+    def test_count_is_bounded(self):
+        self.create_posts(3)
+        paginator = posts_admin.BoundedCountPaginator(Post.objects.all(), 2)
+        self.assertEqual(paginator.count, 3)
+        with mock.patch.object(posts_admin, 'COUNT_LIMIT', 2):
+            paginator = posts_admin.BoundedCountPaginator(
+                Post.objects.all(), 2
+            )
+            self.assertEqual(paginator.count, 2)
+
+    def test_search_uses_full_text_index(self):
+        Post.objects.create(author=self.admin, text='Про котиков')
+        Post.objects.create(author=self.admin, text='Про собак')
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'котик'}
+        )
+        self.assertEqual(
+            [post.text for post in response.context['cl'].result_list],
+            ['Про котиков'],
+        )
+
+    @mock.patch.object(posts_admin, 'BATCH_SIZE', 2)
+    def test_batch_actions(self):
+        self.create_posts(5)
+        pks = list(Post.objects.values_list('pk', flat=True))
+        url = reverse('admin:posts_post_changelist')
+        self.client.post(url, {
+            'action': 'move_to_group',
+            '_selected_action': pks[:2],
+            'group': '',
+        })
+        self.assertEqual(Post.objects.filter(group=None).count(), 2)
+
+        selection = {
+            'action': 'delete_in_batches',
+            'select_across': '1',
+            '_selected_action': pks[:1],
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, selection)
+        # подтверждение показывает число, не загружая сами объекты
+        self.assertContains(response, 'Да, удалить')
+        self.assertEqual(response.context['count'], 5)
+        self.assertFalse(any(
+            'posts_post' in query['sql'] and 'COUNT' not in query['sql']
+            for query in queries.captured_queries
+        ))
+        self.assertEqual(Post.objects.count(), 5)
+
+        self.client.post(url, {**selection, 'post': 'yes'})
+        self.assertFalse(Post.objects.exists())
+        self.assertFalse(Comment.objects.exists())
@@ -0,0 +1,143 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(MAX_POSTS=2, COMMENTS_PER_PAGE=2)
+class ApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, text=f'Пост {number}', group=cls.group
+            )
+            for number in range(3)
+        ]
+        for number in range(3):
+            Comment.objects.create(
+                post=cls.posts[0], author=cls.reader, text=f'Ответ {number}'
+            )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, name, *args, **params):
+        response = self.client.get(reverse(name, args=args), params)
+        return response.status_code, response.json()
+
+    def walk(self, name, *args, **params):
+        """Все страницы ленты по ссылкам next."""
+        status, data = self.get(name, *args, **params)
+        self.assertEqual(status, 200)
+        results = data['results']
+        while data['next']:
+            data = self.client.get(data['next']).json()
+            results += data['results']
+        return results
+
+    def test_index_pages_with_cursor(self):
+        results = self.walk('api:index', fields='id,text')
+        self.assertEqual(
+            results,
+            [{'id': post.pk, 'text': post.text}
+             for post in reversed(self.posts)],
+        )
+
+    def test_projection_fetches_only_requested_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('api:index'), {'fields': 'text'})
+        selects = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('SELECT')
+        ]
+        self.assertEqual(len(selects), 1)
+        columns = selects[0].split(' FROM ')[0]
+        self.assertIn('"text"', columns)
+        self.assertNotIn('"image"', columns)
+        status, data = self.get('api:index', fields='text,author,group')
+        self.assertEqual(
+            data['results'][0],
+            {'text': 'Пост 2', 'author': 'author', 'group': 'group'},
+        )
+        status, data = self.get('api:index', fields='text,password')
+        self.assertEqual(status, 400)
+
+    def test_group_and_profile(self):
+        status, data = self.get('api:group_posts', 'group', fields='id')
+        self.assertEqual(data['group']['title'], 'Группа')
+        self.assertEqual(len(data['results']), 2)
+        status, data = self.get('api:profile', 'author', fields='id')
+        self.assertEqual(data['author']['posts_count'], 3)
+        self.assertEqual(data['author']['followers_count'], 1)
+        status, data = self.get('api:group_posts', 'nope')
+        self.assertEqual(status, 404)
+
+    def test_follow_requires_login(self):
+        status, data = self.get('api:follow_index')
+        self.assertEqual(status, 401)
+        self.client.force_login(self.reader)
+        self.assertEqual(
+            [post['id'] for post in self.walk('api:follow_index')],
+            [post.pk for post in reversed(self.posts)],
+        )
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_follow_merges_celebrity_posts(self):
+        fan = User.objects.create_user(username='fan')
+        Follow.objects.create(user=fan, author=self.author)
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.reader, author=other)
+        own = [
+            Post.objects.create(author=other, text=f'Другой {number}')
+            for number in range(2)
+        ]
+        self.client.force_login(self.reader)
+        with CaptureQueriesContext(connection) as queries:
+            results = self.walk('api:follow_index', fields='id,author')
+        self.assertEqual(
+            [post['id'] for post in results],
+            [post.pk for post in reversed(self.posts + own)],
+        )
+        self.assertEqual(results[0]['author'], 'other')
+        self.assertFalse(any(
+            'COUNT(' in query['sql'] for query in queries.captured_queries
+        ))
+
+    def test_markers_in_text_come_back_verbatim(self):
+        text = (
+            '<!--personal:WyJpbmNsdWRlcy9jc3JmX3Rva2VuLmh0bWwiLCB7fV0=-->'
+            '<!--personal:AAAA-->'
+        )
+        post = Post.objects.create(author=self.author, text=text)
+        self.client.force_login(self.reader)
+        status, data = self.get('api:index', fields='id,text')
+        self.assertEqual(status, 200)
+        self.assertEqual(data['results'][0], {'id': post.pk, 'text': text})
+        status, data = self.get('api:post_detail', post.pk, fields='text')
+        self.assertEqual(data['post']['text'], text)
+
+    def test_post_and_comments(self):
+        post = self.posts[0]
+        status, data = self.get('api:post_detail', post.pk)
+        self.assertEqual(data['post']['comments_count'], 3)
+        self.assertIsNone(data['post']['image'])
+        self.assertEqual(
+            [comment['text']
+             for comment in self.walk('api:post_comments', post.pk)],
+            ['Ответ 2', 'Ответ 1', 'Ответ 0'],
+        )
+        status, data = self.get('api:post_detail', 0)
+        self.assertEqual(status, 404)
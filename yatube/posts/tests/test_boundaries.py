@@ -0,0 +1,120 @@
+from django.contrib.auth import get_user_model
+from django.core.paginator import Paginator
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from .. import boundaries
+from ..models import Group, PageBoundary, Post
+from ..paginator import CursorPaginator
+
+User = get_user_model()
+
+
+@override_settings(MAX_POSTS=3)
+class PageBoundaryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='test_user')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_group_slug',
+            description='Тестовое описание',
+        )
+        cls.group2 = Group.objects.create(
+            title='Тестовая группа 2',
+            slug='test_group_slug_2',
+            description='Тестовое описание 2',
+        )
+
+    def create_posts(self, count, group=None):
+        return [
+            Post.objects.create(
+                author=self.user, text=f'Тестовый пост {i}', group=group
+            )
+            for i in range(count)
+        ]
+
+    def boundaries_of(self, feed):
+        return list(PageBoundary.objects.filter(feed=feed).values_list(
+            'number', 'pub_date', 'post_id'
+        ))
+
+    def assert_matches_rebuild(self, *feeds):
+        for feed in feeds:
+            with self.subTest(feed=feed):
+                incremental = self.boundaries_of(feed)
+                boundaries.rebuild(feed)
+                self.assertEqual(incremental, self.boundaries_of(feed))
+
+    def assert_pages_match_offset(self, feed):
+        posts = boundaries.feed_queryset(feed).order_by('-pub_date', '-pk')
+        offset_paginator = Paginator(posts, 3)
+        seek_paginator = CursorPaginator(posts, 3, feed=feed)
+        self.assertEqual(seek_paginator.count, offset_paginator.count)
+        for number in offset_paginator.page_range:
+            with self.subTest(number=number):
+                self.assertEqual(
+                    list(seek_paginator.page(number)),
+                    list(offset_paginator.page(number)),
+                )
+
+    def test_insert_keeps_boundaries(self):
+        self.create_posts(7, group=self.group)
+        self.assert_matches_rebuild(
+            boundaries.FEED_ALL,
+            boundaries.feed_key(group=self.group),
+            boundaries.feed_key(author=self.user),
+        )
+        self.assert_pages_match_offset(boundaries.FEED_ALL)
+
+    def test_delete_shifts_boundaries(self):
+        posts = self.create_posts(8, group=self.group)
+        posts[2].delete()
+        posts[-1].delete()
+        self.assert_matches_rebuild(
+            boundaries.FEED_ALL,
+            boundaries.feed_key(group=self.group),
+        )
+        self.assert_pages_match_offset(boundaries.FEED_ALL)
+
+    def test_delete_cost_does_not_grow_with_boundaries(self):
+        def boundary_queries(post):
+            with CaptureQueriesContext(connection) as queries:
+                post.delete()
+            return len([
+                query for query in queries.captured_queries
+                if 'posts_pageboundary' in query['sql']
+            ])
+
+        few = boundary_queries(self.create_posts(4)[0])
+        many = boundary_queries(self.create_posts(20)[0])
+        self.assertEqual(many, few)
+        self.assert_matches_rebuild(boundaries.FEED_ALL)
+
+    def test_group_change_moves_post_between_feeds(self):
+        posts = self.create_posts(5, group=self.group)
+        self.create_posts(4, group=self.group2)
+        posts[1].group = self.group2
+        posts[1].save()
+        self.assert_matches_rebuild(
+            boundaries.feed_key(group=self.group),
+            boundaries.feed_key(group=self.group2),
+        )
+        self.assert_pages_match_offset(boundaries.feed_key(group=self.group2))
+
+    def test_author_change_moves_post_between_feeds(self):
+        other = User.objects.create_user(username='other_user')
+        posts = self.create_posts(8)
+        Post.objects.create(author=other, text='Пост другого автора')
+        posts[2].author = other
+        posts[2].save()
+        for author in (self.user, other):
+            feed = boundaries.feed_key(author=author)
+            self.assert_matches_rebuild(feed)
+            self.assert_pages_match_offset(feed)
+
+    def test_paginator_without_boundaries_falls_back_to_offset(self):
+        self.create_posts(4)
+        PageBoundary.objects.all().delete()
+        self.assert_pages_match_offset(boundaries.FEED_ALL)
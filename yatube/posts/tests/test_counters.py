@@ -0,0 +1,74 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from ..counters import find_drift, user_counters
+from ..models import Comment, Follow, Post, UserCounters
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.author, text='Тестовый пост')
+
+    def counters_of(self, user):
+        return user_counters(User.objects.get(pk=user.pk))
+
+    def test_posts_count_follows_create_and_delete(self):
+        post = Post.objects.create(author=self.author, text='Ещё пост')
+        self.assertEqual(self.counters_of(self.author).posts_count, 2)
+        post.delete()
+        self.assertEqual(self.counters_of(self.author).posts_count, 1)
+
+    def test_posts_count_follows_author_change(self):
+        post = Post.objects.create(author=self.author, text='Ещё пост')
+        post.author = self.reader
+        post.save()
+        self.assertEqual(self.counters_of(self.author).posts_count, 1)
+        self.assertEqual(self.counters_of(self.reader).posts_count, 1)
+        self.assertEqual(find_drift(), [])
+
+    def test_comments_count_follows_create_and_delete(self):
+        comment = Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        comment.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+
+    def test_follow_counters_follow_create_and_delete(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.counters_of(self.author).followers_count, 1)
+        self.assertEqual(self.counters_of(self.reader).following_count, 1)
+        Follow.objects.filter(user=self.reader, author=self.author).delete()
+        self.assertEqual(self.counters_of(self.author).followers_count, 0)
+        self.assertEqual(self.counters_of(self.reader).following_count, 0)
+
+    def test_deleting_user_leaves_no_counters(self):
+        user = User.objects.create_user(username='leaving_user')
+        Post.objects.create(author=user, text='Пост уходящего автора')
+        Follow.objects.create(user=user, author=self.reader)
+        user_id = user.pk
+        user.delete()
+        self.assertFalse(UserCounters.objects.filter(user_id=user_id).exists())
+        self.assertEqual(self.counters_of(self.reader).followers_count, 0)
+
+    def test_command_detects_and_fixes_drift(self):
+        UserCounters.objects.filter(user=self.author).update(posts_count=5)
+        Post.objects.filter(pk=self.post.pk).update(comments_count=3)
+        self.assertEqual(len(find_drift()), 2)
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_counters', check=True, stdout=StringIO())
+
+        call_command('rebuild_counters', stdout=StringIO())
+        self.assertEqual(find_drift(), [])
+        self.assertEqual(self.counters_of(self.author).posts_count, 1)
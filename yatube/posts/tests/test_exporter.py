@@ -0,0 +1,155 @@
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import boundaries
+from ..models import Comment, Group, Post
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        group = Group.objects.create(title='Группа', slug='group')
+        cls.post = Post.objects.create(
+            author=cls.author,
+            text='Пост с картинкой',
+            group=group,
+            image=SimpleUploadedFile('small.gif', SMALL_GIF),
+        )
+        cls.foreign = foreign = Post.objects.create(
+            author=cls.other, text='Чужой пост'
+        )
+        Comment.objects.create(
+            post=cls.post, author=cls.author, text='Свой комментарий'
+        )
+        Comment.objects.create(
+            post=foreign, author=cls.author, text='Чужому посту'
+        )
+        Comment.objects.create(
+            post=cls.post, author=cls.other, text='Не автора'
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.author)
+
+    def export(self, fmt):
+        response = self.client.get(
+            reverse('posts:profile_export', args=[self.author.username]),
+            {'format': fmt},
+        )
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_jsonl_export(self):
+        records = [
+            json.loads(line)
+            for line in self.export('jsonl').decode().splitlines()
+        ]
+        self.assertEqual(
+            [record['text'] for record in records],
+            ['Пост с картинкой', 'Свой комментарий', 'Чужому посту'],
+        )
+        self.assertEqual(records[0]['group'], 'group')
+        self.assertEqual(records[1]['post'], records[0]['ref'])
+        self.assertNotIn('post', records[2])
+        self.assertEqual(records[2]['post_author'], 'other')
+
+    def test_csv_export(self):
+        rows = list(csv.DictReader(io.StringIO(self.export('csv').decode())))
+        self.assertEqual(
+            [row['type'] for row in rows], ['post', 'comment', 'comment']
+        )
+
+    def test_zip_export_includes_media(self):
+        with zipfile.ZipFile(io.BytesIO(self.export('zip'))) as archive:
+            self.assertEqual(
+                archive.read(f'media/{self.post.image.name}'), SMALL_GIF
+            )
+            self.assertEqual(
+                len(archive.read('content.jsonl').splitlines()), 3
+            )
+
+    def test_only_author_or_staff(self):
+        self.client.force_login(self.other)
+        response = self.client.get(
+            reverse('posts:profile_export', args=[self.author.username])
+        )
+        self.assertEqual(response.status_code, 403)
+
+    def test_command_roundtrips_through_import(self):
+        path = os.path.join(TEMP_MEDIA_ROOT, 'export.jsonl')
+        call_command('export_content', 'author', output=path)
+        Post.objects.filter(author=self.author).delete()
+        call_command('import_content', path, stdout=io.StringIO())
+        post = Post.objects.get(author=self.author)
+        self.assertEqual(post.text, 'Пост с картинкой')
+        self.assertEqual(post.image.name, self.post.image.name)
+        self.assertEqual(
+            list(post.comments.values_list('text', flat=True)),
+            ['Свой комментарий'],
+        )
+
+    def test_comments_on_other_posts_find_them_after_import(self):
+        path = os.path.join(TEMP_MEDIA_ROOT, 'comments.jsonl')
+        call_command('export_content', 'author', output=path)
+        # в другой базе у чужого поста другой id, а его id занят
+        Post.objects.filter(author=self.author).delete()
+        Post.objects.filter(pk=self.foreign.pk).delete()
+        copy = Post.objects.create(author=self.other, text='Чужой пост')
+        Post.objects.filter(pk=copy.pk).update(
+            pub_date=self.foreign.pub_date
+        )
+        boundaries.rebuild_all()
+        decoy = Post.objects.create(
+            pk=self.foreign.pk, author=self.other, text='Другой пост'
+        )
+        call_command('import_content', path, stdout=io.StringIO())
+        self.assertEqual(
+            list(copy.comments.values_list('text', flat=True)),
+            ['Чужому посту'],
+        )
+        self.assertFalse(decoy.comments.exists())
+        copy.refresh_from_db()
+        self.assertEqual(copy.comments_count, 1)
+
+    def test_missing_post_of_comment_is_reported(self):
+        path = os.path.join(TEMP_MEDIA_ROOT, 'missing.jsonl')
+        call_command('export_content', 'author', output=path)
+        Post.objects.all().delete()
+        with self.assertRaisesMessage(CommandError, 'запись 3'):
+            call_command('import_content', path, stdout=io.StringIO())
+        self.assertFalse(Comment.objects.filter(text='Чужому посту').exists())
@@ -0,0 +1,72 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+@override_settings(FEED_ITEMS=2)
+class FeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        for number in range(3):
+            Post.objects.create(
+                author=cls.author, text=f'Пост {number}', group=cls.group
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feeds_bounded(self):
+        urls = [
+            reverse('posts:index_rss'),
+            reverse('posts:index_atom'),
+            reverse('posts:group_rss', args=[self.group.slug]),
+            reverse('posts:group_atom', args=[self.group.slug]),
+            reverse('posts:profile_rss', args=[self.author.username]),
+            reverse('posts:profile_atom', args=[self.author.username]),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Пост 2')
+                self.assertContains(response, 'Пост 1')
+                self.assertNotContains(response, 'Пост 0')
+
+    def test_unknown_group_404(self):
+        response = self.client.get(reverse('posts:group_rss', args=['nope']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_polling_served_from_cache(self):
+        url = reverse('posts:index_rss')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertNotIn('Last-Modified', response)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+
+        Post.objects.create(author=self.author, text='Новый пост')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Новый пост')
+
+    def test_edit_is_not_hidden_by_if_modified_since(self):
+        url = reverse('posts:index_rss')
+        self.client.get(url)
+        since = 'Fri, 01 Jan 2100 00:00:00 GMT'
+        newest = Post.objects.get(text='Пост 2')
+        newest.text = 'Исправленный пост'
+        newest.save()
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Исправленный пост')
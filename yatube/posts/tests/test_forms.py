@@ -4,6 +4,7 @@ import tempfile
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
@@ -98,7 +99,8 @@ class FormTests(TestCase):
         self.assertEqual(post.text, self.ADDED_POST_TEXT)
         self.assertEqual(post.group, self.group)
         self.assertEqual(post.author, self.user)
-        self.assertEqual(post.image, f'posts/{IMAGE_NAME}')
+        # картинка хранится под хешем содержимого
+        self.assertRegex(post.image.name, r'^posts/\w{2}/\w{2}/\w{64}\.gif$')
 
     def test_post_edit_form(self):
         post_count_before = Post.objects.count()
@@ -152,6 +154,8 @@ class FormTests(TestCase):
         comment = Comment.objects.order_by("id").last()
         self.assertTrue(comment.text, COMMENT_TEXT)
 
+        # после редиректа страница поста уже лежит в кеше заготовок
+        cache.clear()
         response = self.authorized_client.get(
             reverse('posts:post_detail', kwargs={'post_id': self.post_id})
         )
@@ -0,0 +1,196 @@
+import io
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings,
+)
+from django.urls import reverse
+from PIL import Image
+
+from .. import images
+from ..forms import PostForm
+from ..models import Post
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+
+ORIENTATION = 0x0112
+
+
+def image_file(name, mode='RGB', size=(300, 100), image_format='JPEG',
+               **save_options):
+    output = io.BytesIO()
+    Image.new(mode, size).save(output, image_format, **save_options)
+    return SimpleUploadedFile(name, output.getvalue())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_IMAGE_MAX_DIMENSION=100)
+class ImageProcessingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def stored_files(self):
+        root = os.path.join(TEMP_MEDIA_ROOT, 'posts')
+        return [
+            os.path.relpath(os.path.join(path, name), TEMP_MEDIA_ROOT)
+            for path, _, names in os.walk(root)
+            for name in names
+        ]
+
+    def create_post(self, image):
+        self.client.post(
+            reverse('posts:post_create'), {'text': 'Пост', 'image': image}
+        )
+        return Post.objects.get(text='Пост')
+
+    def test_photo_downscaled_and_stripped(self):
+        exif = Image.Exif()
+        exif[ORIENTATION] = 6
+        before = set(self.stored_files())
+        post = self.create_post(
+            image_file('photo.jpg', size=(300, 100), exif=exif)
+        )
+        self.assertTrue(post.image.name.endswith('.jpg'))
+        with Image.open(post.image.path) as image:
+            # поворот из EXIF применён, а сами метаданные удалены
+            self.assertEqual(image.size, (33, 100))
+            self.assertNotIn('exif', image.info)
+            self.assertTrue(image.info.get('progressive'))
+        # размеры и заглушка записаны в пост
+        self.assertEqual((post.image_width, post.image_height), (33, 100))
+        self.assertTrue(
+            post.image_placeholder.startswith('data:image/jpeg;base64,')
+        )
+        # исходный файл ещё может понадобиться посту с той же картинкой
+        # из параллельной транзакции, его убирает cleanup_media
+        added = set(self.stored_files()) - before
+        self.assertEqual(len(added), 2)
+        self.assertIn(post.image.name, added)
+        with self.settings(MEDIA_CLEANUP_GRACE=0):
+            call_command('cleanup_media', stdout=io.StringIO())
+        self.assertEqual(
+            set(self.stored_files()) - before, {post.image.name}
+        )
+
+    def test_transparent_image_keeps_alpha(self):
+        post = self.create_post(
+            image_file('logo.png', mode='RGBA', image_format='PNG')
+        )
+        self.assertRegex(post.image.name, r'\.(png|webp)$')
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.mode, 'RGBA')
+            self.assertEqual(image.size, (100, 33))
+
+    def test_gif_kept_as_is(self):
+        upload = image_file('anim.gif', mode='P', image_format='GIF')
+        content = upload.read()
+        upload.seek(0)
+        post = self.create_post(upload)
+        with post.image.open() as image:
+            self.assertEqual(image.read(), content)
+        self.assertEqual((post.image_width, post.image_height), (300, 100))
+        self.assertTrue(post.image_placeholder)
+
+    def test_replaced_image_not_processed(self):
+        post = Post.objects.create(
+            author=self.user,
+            text='Пост',
+            image=image_file('old.jpg'),
+        )
+        old_name = post.image.name
+        Post.objects.filter(pk=post.pk).update(image='posts/new.jpg')
+        images.process(post.pk, old_name)
+        post.refresh_from_db()
+        self.assertEqual(post.image.name, 'posts/new.jpg')
+
+    def test_metadata_rebuilt_for_old_posts(self):
+        post = Post.objects.create(
+            author=self.user, text='Старый пост', image=image_file('old.jpg')
+        )
+        call_command('rebuild_image_metadata', stdout=io.StringIO())
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (300, 100))
+        self.assertTrue(post.image_placeholder)
+
+    @override_settings(POST_IMAGE_MAX_SIZE=100)
+    def test_oversized_upload_rejected(self):
+        form = PostForm(
+            data={'text': 'Пост'}, files={'image': image_file('big.jpg')}
+        )
+        self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=1000)
+    def test_huge_resolution_rejected(self):
+        form = PostForm(
+            data={'text': 'Пост'}, files={'image': image_file('wide.jpg')}
+        )
+        self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, MEDIA_CLEANUP_GRACE=0)
+class ImageReferenceTests(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='author')
+
+    def create_post(self, name):
+        return Post.objects.create(
+            author=self.user, text='Пост', image=image_file(name)
+        )
+
+    def test_file_deleted_with_last_reference(self):
+        first = self.create_post('first.jpg')
+        second = self.create_post('second.jpg')
+        self.assertEqual(first.image.name, second.image.name)
+        storage = first.image.storage
+        name = first.image.name
+
+        first.delete()
+        self.assertTrue(storage.exists(name))
+        second.delete()
+        self.assertFalse(storage.exists(name))
+
+    def test_replaced_image_released(self):
+        post = self.create_post('old.jpg')
+        old_name = post.image.name
+        post.image = image_file('new.jpg', size=(10, 10))
+        post.save()
+        self.assertFalse(post.image.storage.exists(old_name))
+
+    def test_cleanup_media_removes_orphans(self):
+        post = self.create_post('kept.jpg')
+        storage = post.image.storage
+        orphan = storage.save('posts/orphan.jpg', ContentFile(b'orphan'))
+
+        output = io.StringIO()
+        call_command('cleanup_media', '--dry-run', stdout=output)
+        self.assertIn(orphan, output.getvalue())
+        self.assertTrue(storage.exists(orphan))
+
+        call_command('cleanup_media', stdout=io.StringIO())
+        self.assertFalse(storage.exists(orphan))
+        self.assertTrue(storage.exists(post.image.name))
@@ -0,0 +1,134 @@
+import io
+import json
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from .. import search
+from ..boundaries import FEED_ALL
+from ..models import Comment, Follow, Group, PageBoundary, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class ImportContentTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def write(self, suffix, content):
+        handle, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(handle, 'w', encoding='utf-8') as file:
+            file.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def jsonl(self, records):
+        return self.write(
+            '.jsonl', '\n'.join(json.dumps(record) for record in records)
+        )
+
+    def test_jsonl_import_rebuilds_derived_data(self):
+        Group.objects.create(title='Кошки', slug='cats')
+        path = self.jsonl([
+            {'type': 'follow', 'user': 'reader', 'author': 'leo'},
+            {'type': 'post', 'ref': 'p1', 'author': 'leo', 'group': 'cats',
+             'text': 'Про котиков', 'pub_date': '2020-01-02T03:04:05Z'},
+            {'type': 'post', 'ref': 'p2', 'author': 'leo',
+             'text': 'Второй пост'},
+            {'type': 'comment', 'post': 'p1', 'author': 'reader',
+             'text': 'Котики!'},
+        ])
+        output = io.StringIO()
+        call_command('import_content', path, chunk_size=2, stdout=output)
+        self.assertIn('Загружено постов: 2', output.getvalue())
+
+        post = Post.objects.get(text='Про котиков')
+        self.assertEqual(post.pub_date.year, 2020)
+        self.assertEqual(post.group.slug, 'cats')
+        self.assertEqual(post.comments_count, 1)
+        leo = User.objects.get(username='leo')
+        self.assertEqual(leo.counters.posts_count, 2)
+        self.assertEqual(leo.counters.followers_count, 1)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user__username='reader').count(), 2
+        )
+        self.assertTrue(PageBoundary.objects.filter(feed=FEED_ALL).exists())
+        self.assertEqual(list(search.search('котик', 10)), [post])
+
+    def test_csv_import_to_existing_post(self):
+        author = User.objects.create_user(username='author')
+        post = Post.objects.create(author=author, text='Старый пост')
+        path = self.write('.csv', (
+            'type,author,text,post_id,user\n'
+            f'comment,author,Новый комментарий,{post.pk},\n'
+            'follow,author,,,fan\n'
+        ))
+        call_command('import_content', path, stdout=io.StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertTrue(Follow.objects.filter(
+            user__username='fan', author=author
+        ).exists())
+
+    def test_invalid_record_keeps_loaded_chunks(self):
+        path = self.jsonl([
+            {'type': 'post', 'author': 'leo', 'text': 'Первый'},
+            {'type': 'post', 'author': 'leo', 'text': 'Второй'},
+            {'type': 'comment', 'post': 'нет такого', 'author': 'leo',
+             'text': 'Потерянный'},
+        ])
+        with self.assertRaisesMessage(CommandError, 'запись 3'):
+            call_command(
+                'import_content', path, chunk_size=2, stdout=io.StringIO()
+            )
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertFalse(Comment.objects.exists())
+        leo = User.objects.get(username='leo')
+        self.assertEqual(leo.counters.posts_count, 2)
+
+    def test_report_counts_only_new_follows(self):
+        leo = User.objects.create_user(username='leo')
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=leo)
+        path = self.jsonl([
+            {'type': 'follow', 'user': 'reader', 'author': 'leo'},
+            {'type': 'follow', 'user': 'fan', 'author': 'leo'},
+            {'type': 'follow', 'user': 'fan', 'author': 'leo'},
+        ])
+        output = io.StringIO()
+        call_command('import_content', path, stdout=output)
+        self.assertIn('подписок: 1', output.getvalue())
+        self.assertEqual(Follow.objects.count(), 2)
+
+    def test_dates_kept_without_touching_model_fields(self):
+        path = self.jsonl([
+            {'type': 'post', 'ref': 'p1', 'author': 'leo', 'text': 'Старый',
+             'pub_date': '2019-05-06T07:08:09Z'},
+            {'type': 'post', 'author': 'leo', 'text': 'Без даты'},
+            {'type': 'comment', 'post': 'p1', 'author': 'leo',
+             'text': 'Ответ', 'created': '2019-05-07T00:00:00Z'},
+        ])
+        call_command('import_content', path, stdout=io.StringIO())
+        self.assertEqual(Post.objects.get(text='Старый').pub_date.year, 2019)
+        self.assertEqual(
+            Post.objects.get(text='Без даты').pub_date.date(),
+            timezone.now().date(),
+        )
+        self.assertEqual(Comment.objects.get().created.day, 7)
+        self.assertTrue(Post._meta.get_field('pub_date').auto_now_add)
+        self.assertTrue(Comment._meta.get_field('created').auto_now_add)
+
+    def test_unknown_post_id_is_invalid_record(self):
+        path = self.jsonl([
+            {'type': 'post', 'author': 'leo', 'text': 'Пост'},
+            {'type': 'comment', 'post_id': 999, 'author': 'leo',
+             'text': 'В никуда'},
+        ])
+        with self.assertRaisesMessage(CommandError, 'запись 2'):
+            call_command('import_content', path, stdout=io.StringIO())
+        self.assertFalse(Comment.objects.exists())
@@ -0,0 +1,72 @@
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+
+from ..models import Comment, Follow, Group, Post, TimelineEntry
+from ..paginator import NEXT, PREVIOUS, CursorPaginator
+
+User = get_user_model()
+
+
+@skipUnless(connection.vendor == 'sqlite', 'План запроса в формате SQLite')
+class FeedIndexTests(TestCase):
+    """Запросы лент должны идти по составным индексам без сортировки."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='test_user')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_group_slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text='Тестовый пост', group=cls.group
+        )
+        Comment.objects.create(
+            author=cls.user, post=cls.post, text='Тестовый комментарий'
+        )
+
+    def feed_plan(self, posts, **kwargs):
+        paginator = CursorPaginator(posts, 10, **kwargs)
+        key = self.post.pub_date, self.post.pk
+        return ''.join(
+            rows[:10].explain() for rows in (
+                paginator.object_list,
+                paginator.keyset(NEXT, *key),
+                paginator.keyset(PREVIOUS, *key),
+            )
+        )
+
+    def assert_uses_index(self, plan, index):
+        self.assertIn(f'INDEX {index}', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_index_feed_uses_date_index(self):
+        plan = self.feed_plan(Post.objects.select_related('author', 'group'))
+        self.assert_uses_index(plan, 'post_date_idx')
+
+    def test_group_feed_uses_group_index(self):
+        plan = self.feed_plan(self.group.posts.select_related('author'))
+        self.assert_uses_index(plan, 'post_group_date_idx')
+
+    def test_profile_feed_uses_author_index(self):
+        plan = self.feed_plan(self.user.posts.select_related('group'))
+        self.assert_uses_index(plan, 'post_author_date_idx')
+
+    def test_comments_use_post_index(self):
+        plan = self.post.comments.select_related('author')[:10].explain()
+        self.assert_uses_index(plan, 'comment_post_created_idx')
+
+    def test_follow_feed_uses_timeline_index(self):
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.user)
+        plan = self.feed_plan(
+            TimelineEntry.objects.filter(user=reader).select_related(
+                'post__author', 'post__group'
+            ),
+            pk_field='post_id',
+        )
+        self.assert_uses_index(plan, 'timeline_user_date_idx')
@@ -0,0 +1,75 @@
+import io
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import search
+from ..models import Comment, Post
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='author')
+        cls.cats = Post.objects.create(
+            author=cls.user, text='Кошки спят котики мурлычут котики'
+        )
+        cls.dogs = Post.objects.create(
+            author=cls.user, text='Собаки лают на прохожих'
+        )
+        cls.commented = Post.objects.create(author=cls.user, text='Без слов')
+        Comment.objects.create(
+            post=cls.commented, author=cls.user, text='Похоже на котиков'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def found(self, text, per_page=10, cursor=None):
+        return list(search.search(text, per_page, cursor))
+
+    def test_posts_ranked_and_found_by_comments(self):
+        self.assertEqual(self.found('котик'), [self.cats, self.commented])
+        self.assertEqual(self.found('СОБАКИ лают'), [self.dogs])
+        self.assertEqual(self.found('"); DROP TABLE'), [])
+        self.assertEqual(self.found(''), [])
+
+    def test_index_follows_save_and_delete(self):
+        dogs = Post.objects.get(pk=self.dogs.pk)
+        dogs.text = 'Теперь про попугаев'
+        dogs.save()
+        self.assertEqual(self.found('собаки'), [])
+        self.assertEqual(self.found('попугаев'), [self.dogs])
+
+        Comment.objects.filter(post=self.commented).delete()
+        self.assertEqual(self.found('котик'), [self.cats])
+        Post.objects.filter(pk=self.cats.pk).delete()
+        self.assertEqual(self.found('котик'), [])
+
+    def test_cursor_pages(self):
+        first = search.search('котик', 1)
+        self.assertEqual(list(first), [self.cats])
+        second = search.search('котик', 1, first.next_cursor)
+        self.assertEqual(list(second), [self.commented])
+        self.assertEqual(second.number, 2)
+        self.assertFalse(second.next_cursor)
+
+    def test_rebuild_command(self):
+        Post.objects.filter(pk=self.dogs.pk).update(text='Про хомяков')
+        call_command('rebuild_search', stdout=io.StringIO())
+        self.assertEqual(self.found('хомяков'), [self.dogs])
+        self.assertEqual(self.found('собаки'), [])
+
+    @override_settings(MAX_POSTS=1)
+    def test_search_view(self):
+        response = self.client.get(reverse('posts:search'), {'q': 'котик'})
+        self.assertEqual(list(response.context['page_obj']), [self.cats])
+        self.assertContains(
+            response,
+            f'cursor={response.context["page_obj"].next_cursor}',
+        )
@@ -0,0 +1,176 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+
+from .. import generations, thumbnails
+from ..models import Post
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def uploaded(name='small.gif'):
+    return SimpleUploadedFile(
+        name=name, content=SMALL_GIF, content_type='image/gif'
+    )
+
+
+def lookup(image):
+    geometry, options = thumbnails.THUMBNAILS['post']
+    return thumbnails.DeferredThumbnailBackend().lookup(
+        image, geometry, **options
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_create_generates_thumbnails(self):
+        self.client.post(
+            reverse('posts:post_create'),
+            {'text': 'Пост с картинкой', 'image': uploaded('created.gif')},
+        )
+        post = Post.objects.get(text='Пост с картинкой')
+        self.assertTrue(lookup(post.image))
+
+    @override_settings(TASKS_EAGER=False)
+    @mock.patch('sorl.thumbnail.base.ThumbnailBackend._create_thumbnail')
+    def test_pages_never_process_images(self, create_thumbnail):
+        post = Post.objects.create(
+            author=self.user, text='Пост', image=uploaded('lazy.gif')
+        )
+        with mock.patch('core.tasks.submit') as submit:
+            response = self.client.get(reverse('posts:index'))
+            self.client.get(
+                reverse('posts:post_detail', kwargs={'post_id': post.pk})
+            )
+        self.assertContains(response, post.image.url)
+        create_thumbnail.assert_not_called()
+        # повторные промахи не ставят задачу ещё раз
+        self.assertEqual(submit.call_count, len(thumbnails.THUMBNAILS))
+        geometry, options = thumbnails.THUMBNAILS['post']
+        submit.assert_any_call(
+            thumbnails.generate, post.image.name, geometry, options
+        )
+
+    def test_generate_invalidates_pages(self):
+        post = Post.objects.create(
+            author=self.user, text='Пост', image=uploaded('ready.gif')
+        )
+        before = generations.get(f'post:{post.pk}')
+        geometry, options = thumbnails.THUMBNAILS['post']
+        thumbnails.generate(post.image.name, geometry, dict(options))
+        self.assertTrue(lookup(post.image))
+        self.assertNotEqual(generations.get(f'post:{post.pk}'), before)
+
+    def test_existing_thumbnail_still_invalidates_pages(self):
+        post = Post.objects.create(
+            author=self.user, text='Пост', image=uploaded('twice.gif')
+        )
+        geometry, options = thumbnails.THUMBNAILS['post']
+        thumbnails.generate(post.image.name, geometry, dict(options))
+        before = generations.get(f'post:{post.pk}')
+        thumbnails.generate(post.image.name, geometry, dict(options))
+        self.assertNotEqual(generations.get(f'post:{post.pk}'), before)
+
+    def test_thumbnail_keys_are_not_kept_in_memory(self):
+        post = Post.objects.create(
+            author=self.user, text='Пост', image=uploaded('shared.gif')
+        )
+        geometry, options = thumbnails.THUMBNAILS['post']
+        ThumbnailBackend().get_thumbnail(post.image, geometry, **options)
+        key = add_prefix(
+            thumbnails.DeferredThumbnailBackend().thumbnail_file(
+                post.image, geometry, **options
+            ).key
+        )
+        shared = caches['shared']
+        ready = shared.get(key)
+        shared.set(key, EMPTY_VALUE)
+        self.assertEqual(thumbnails.lookup_many([post.image]), {})
+        # миниатюру создал другой процесс: промах в памяти не залежится
+        shared.set(key, ready)
+        self.assertIn(
+            (post.image.name, 'post'), thumbnails.lookup_many([post.image])
+        )
+
+    def test_preload_reads_whole_page_at_once(self):
+        posts = [
+            Post.objects.create(
+                author=self.user,
+                text=f'Пост {number}',
+                image=uploaded(f'page{number}.gif'),
+            )
+            for number in range(3)
+        ]
+        posts.append(Post.objects.create(author=self.user, text='Без'))
+        for post in posts[:3]:
+            thumbnails.schedule_all(post.image)
+        cache.clear()
+
+        with self.assertNumQueries(1):
+            thumbnails.preload(posts)
+        with self.assertNumQueries(0):
+            thumbnails.preload(posts)
+        for post in posts[:3]:
+            self.assertEqual(post.thumbnail.url, lookup(post.image).url)
+            self.assertEqual(
+                (post.thumbnail.width, post.thumbnail.height), (960, 339)
+            )
+            self.assertEqual(
+                [candidate.split()[1]
+                 for candidate in post.thumbnail.srcset.split(', ')],
+                ['480w', '960w', '1920w'],
+            )
+        self.assertIsNone(posts[3].thumbnail)
+
+    @override_settings(TASKS_EAGER=False)
+    def test_page_image_has_dimensions_before_thumbnail(self):
+        post = Post.objects.create(
+            author=self.user,
+            text='Пост',
+            image=uploaded('sized.gif'),
+            image_width=2,
+            image_height=1,
+            image_placeholder='data:image/jpeg;base64,AAAA',
+        )
+        with mock.patch('core.tasks.submit'):
+            response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, f'src="{post.image.url}"')
+        self.assertContains(response, 'width="2" height="1"')
+        self.assertContains(response, 'loading="lazy"')
+        self.assertContains(response, 'url(data:image/jpeg;base64,AAAA)')
+        self.assertNotContains(response, 'srcset=')
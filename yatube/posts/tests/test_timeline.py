@@ -0,0 +1,122 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.old_post = Post.objects.create(
+            author=cls.author, text='Пост до подписки'
+        )
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def follow_page_ids(self):
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        return [post.pk for post in response.context['page_obj']]
+
+    def timeline_ids(self):
+        return list(TimelineEntry.objects.filter(
+            user=self.reader
+        ).values_list('post_id', flat=True))
+
+    def test_follow_backfills_and_new_posts_fan_out(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.timeline_ids(), [self.old_post.pk])
+
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertEqual(self.timeline_ids(), [new_post.pk, self.old_post.pk])
+        self.assertEqual(self.follow_page_ids(), self.timeline_ids())
+
+    def test_unfollow_drops_author_posts(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.filter(user=self.reader, author=self.author).delete()
+        self.assertEqual(self.timeline_ids(), [])
+        self.assertEqual(self.follow_page_ids(), [])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_celebrity_posts_are_merged_at_read_time(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertEqual(self.timeline_ids(), [])
+        self.assertEqual(
+            self.follow_page_ids(), [new_post.pk, self.old_post.pk]
+        )
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1, MAX_POSTS=3)
+    def test_merged_feed_pages_by_cursor(self):
+        celebrity = User.objects.create_user(username='celebrity')
+        fan = User.objects.create_user(username='fan')
+        Follow.objects.create(user=fan, author=celebrity)
+        Follow.objects.create(user=self.reader, author=celebrity)
+        Follow.objects.create(user=self.reader, author=self.author)
+        for i in range(4):
+            Post.objects.create(author=celebrity, text=f'Знаменитость {i}')
+            Post.objects.create(author=self.author, text=f'Автор {i}')
+        expected = list(Post.objects.order_by(
+            '-pub_date', '-pk'
+        ).values_list('pk', flat=True))
+
+        pages, cursor = [], ''
+        url = reverse('posts:follow_index')
+        while True:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.reader_client.get(url, {'cursor': cursor})
+            page = response.context['page_obj']
+            pages.append([post.pk for post in page])
+            for query in queries.captured_queries:
+                sql = query['sql']
+                if 'posts_post' in sql and 'COUNT(' in sql:
+                    self.fail(f'COUNT в ленте подписок: {sql}')
+            if not page.next_cursor:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(sum(pages, []), expected)
+        self.assertEqual(len(pages), 3)
+
+        response = self.reader_client.get(
+            url, {'cursor': page.previous_cursor}
+        )
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']], pages[1]
+        )
+
+        # номер страницы не подменяется молча первой страницей
+        response = self.reader_client.get(url, {'page': 2})
+        self.assertEqual(response.status_code, 404)
+        response = self.reader_client.get(url, {'page': 1})
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']], pages[0]
+        )
+
+    def test_author_change_moves_post_between_timelines(self):
+        other = User.objects.create_user(username='other')
+        other_reader = User.objects.create_user(username='other_reader')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=other_reader, author=other)
+        post = Post.objects.get(pk=self.old_post.pk)
+        post.author = other
+        post.save()
+        self.assertEqual(self.timeline_ids(), [])
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=other_reader, post=post
+        ).exists())
+
+    def test_follow_page_queries_do_not_grow_with_posts(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        for i in range(5):
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+        self.reader_client.get(reverse('posts:follow_index'))
+        with self.assertNumQueries(7):
+            self.reader_client.get(reverse('posts:follow_index'))
@@ -1,3 +1,4 @@
+from http import HTTPStatus
 import shutil
 import tempfile
 
@@ -5,11 +6,18 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.db import connection
+from django.test import (
+    Client, RequestFactory, TestCase, override_settings,
+)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django import forms
 
-from ..models import Group, Post, Follow
+from core import shells
+
+from .. import generations
+from ..models import Comment, Group, Post, Follow
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -81,6 +89,8 @@ class ViewTests(TestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def setUp(self):
+        # страницы кешируются целиком, а тестам нужен их контекст
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
 
@@ -279,6 +289,8 @@ class CacheTests(TestCase):
         cache.clear()
 
     def setUp(self):
+        # страницы кешируются целиком, а тестам нужен их контекст
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
 
@@ -287,13 +299,227 @@ class CacheTests(TestCase):
         post_obj = response.context.get('page_obj')[0]
         self.assertEqual(post_obj.pk, self.post_id)
         cache_check = response.content
-        Post.objects.get(pk=self.post_id).delete()
+        # update() не шлёт сигналов, поэтому фрагмент остаётся в кеше
+        Post.objects.filter(pk=self.post_id).update(text='Новый текст')
         response = self.authorized_client.get(reverse('posts:index'))
         self.assertEqual(response.content, cache_check)
         cache.clear()
         response = self.authorized_client.get(reverse('posts:index'))
         self.assertNotEqual(response.content, cache_check)
 
+    def test_index_cache_invalidated_by_writes(self):
+        response = self.authorized_client.get(reverse('posts:index'))
+        cache_check = response.content
+        post = Post.objects.get(pk=self.post_id)
+        post.text = 'Отредактированный пост'
+        post.save()
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotEqual(response.content, cache_check)
+        self.assertContains(response, 'Отредактированный пост')
+
+        post.delete()
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'Отредактированный пост')
+
+    def test_group_and_profile_cache_invalidated_by_comment(self):
+        urls = (
+            reverse('posts:group_list', kwargs={'slug': self.GROUP_SLUG}),
+            reverse('posts:profile', kwargs={'username': self.USER_NAME}),
+        )
+        for url in urls:
+            self.authorized_client.get(url)
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий'
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertContains(response, 'Комментариев: 1')
+
+    def test_pages_invalidated_by_author_rename(self):
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.GROUP_SLUG}),
+            reverse('posts:profile', kwargs={'username': self.USER_NAME}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post_id}),
+        )
+        for url in urls:
+            self.authorized_client.get(url)
+        author = User.objects.get(pk=self.user.pk)
+        author.first_name, author.last_name = 'Лев', 'Толстой'
+        author.save()
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertContains(response, 'Лев Толстой')
+
+    def test_login_does_not_invalidate_pages(self):
+        generation = generations.get(f'author:{self.user.pk}')
+        self.client.force_login(User.objects.get(pk=self.user.pk))
+        User.objects.get(pk=self.user.pk).save()
+        self.assertEqual(generations.get(f'author:{self.user.pk}'), generation)
+
+
+class PageCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='test_user')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_group_slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text='Тестовый пост', group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+
+    def test_anonymous_pages_served_from_cache(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                content = self.client.get(url).content
+                with self.assertNumQueries(0):
+                    response = self.client.get(url)
+                self.assertIsNone(response.context)
+                self.assertEqual(response.content, content)
+
+    def test_cached_pages_invalidated_by_writes(self):
+        for url in self.urls:
+            self.client.get(url)
+        self.post.text = 'Отредактированный пост'
+        self.post.save()
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertContains(
+                    self.client.get(url), 'Отредактированный пост'
+                )
+
+    def test_conditional_get_returns_not_modified(self):
+        url = self.urls[0]
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertIn('public', response['Cache-Control'])
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+        Post.objects.create(author=self.user, text='Новый пост')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_logged_in_validators_are_private(self):
+        client = Client()
+        client.force_login(self.user)
+        other = Client()
+        other.force_login(User.objects.create_user(username='other'))
+        url = self.urls[0]
+        response = client.get(url)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotEqual(other.get(url)['ETag'], response['ETag'])
+        response = client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_logged_in_users_bypass_cache(self):
+        client = Client()
+        client.force_login(self.user)
+        for url in self.urls:
+            with self.subTest(url=url):
+                client.get(url)
+                # страница пользователя не попадает в кеш для анонимов
+                self.assertNotContains(self.client.get(url), 'Выйти')
+                self.assertIsNotNone(client.get(url).context)
+
+
+class PageShellTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.follower = User.objects.create_user(username='follower')
+        Follow.objects.create(user=cls.follower, author=cls.author)
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.post_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}
+        )
+        self.profile_url = reverse(
+            'posts:profile', kwargs={'username': self.author.username}
+        )
+
+    def client_for(self, user, **kwargs):
+        client = Client(**kwargs)
+        client.force_login(user)
+        return client
+
+    def test_shell_is_shared_between_users(self):
+        response = self.client_for(self.author).get(self.post_url)
+        self.assertContains(response, 'Пользователь: author')
+        self.assertContains(response, 'Редактировать')
+        self.assertContains(response, '(Вы)')
+
+        response = self.client_for(self.reader).get(self.post_url)
+        self.assertTemplateNotUsed(response, 'posts/post_detail.html')
+        self.assertContains(response, 'Пользователь: reader')
+        self.assertNotContains(response, 'Пользователь: author')
+        self.assertNotContains(response, 'Редактировать')
+        self.assertNotContains(response, '(Вы)')
+
+    def test_follow_button_filled_per_user(self):
+        response = self.client_for(self.author).get(self.profile_url)
+        self.assertNotContains(response, 'Подписаться')
+        self.assertNotContains(response, 'Отписаться')
+        response = self.client_for(self.follower).get(self.profile_url)
+        self.assertTemplateNotUsed(response, 'posts/profile.html')
+        self.assertContains(response, 'Отписаться')
+        response = self.client_for(self.reader).get(self.profile_url)
+        self.assertContains(response, 'Подписаться')
+
+    def test_comment_form_gets_own_csrf_token(self):
+        self.client_for(self.author).get(self.post_url)
+        client = self.client_for(self.reader, enforce_csrf_checks=True)
+        response = client.get(self.post_url)
+        self.assertTemplateNotUsed(response, 'posts/post_detail.html')
+        token = response.cookies['csrftoken'].value
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        response = client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            {'text': 'Комментарий', 'csrfmiddlewaretoken': token},
+        )
+        self.assertRedirects(response, self.post_url)
+        self.assertTrue(
+            Comment.objects.filter(author=self.reader).exists()
+        )
+
+    def test_forged_markers_are_not_filled(self):
+        request = RequestFactory().get('/')
+        request.user = self.reader
+        shell = shells.Shell()
+        real = shell.marker('includes/csrf_token.html', {})
+        forged = [
+            '<!--personal:WyJpbmNsdWRlcy9jc3JmX3Rva2VuLmh0bWwiLCB7fV0=-->',
+            '<!--personal:AAAA-->',
+            f'<!--personal:{"0" * 32}:0-->',
+        ]
+        content = shell.fill(real + ''.join(forged), request)
+        self.assertIn('csrfmiddlewaretoken', content)
+        self.assertTrue(content.endswith(''.join(forged)))
+        # номер части, которой нет в заготовке, просто выбрасывается
+        self.assertEqual(
+            shell.fill(f'<!--personal:{shell.nonce}:5-->', request), ''
+        )
+
 
 class PaginatorViewsTest(TestCase):
     @classmethod
@@ -318,6 +544,9 @@ class PaginatorViewsTest(TestCase):
                 text=f'Тестовый пост {i}',
                 group=cls.group
             )
+
+    def setUp(self):
+        # страницы кешируются целиком, а тестам нужен их контекст
         cache.clear()
 
     def test_index_paginator_first_page(self):
@@ -362,3 +591,91 @@ class PaginatorViewsTest(TestCase):
             len(response.context['page_obj']),
             self.POST_COUNT - self.POSTS_ON_PAGE
         )
+
+    def test_index_cursor_next_page(self):
+        response = self.client.get(reverse('posts:index'))
+        first_page = response.context['page_obj']
+        self.assertFalse(first_page.previous_cursor)
+
+        response = self.client.get(
+            reverse('posts:index') + f'?cursor={first_page.next_cursor}'
+        )
+        second_page = response.context['page_obj']
+        self.assertEqual(second_page.number, 2)
+        self.assertEqual(
+            len(second_page),
+            self.POST_COUNT - self.POSTS_ON_PAGE
+        )
+        self.assertFalse(second_page.next_cursor)
+        self.assertEqual(
+            [post.pk for post in second_page],
+            [post.pk for post in self.client.get(
+                reverse('posts:index') + '?page=2'
+            ).context['page_obj']]
+        )
+
+    def test_index_cursor_previous_page(self):
+        response = self.client.get(reverse('posts:index') + '?page=2')
+        second_page = response.context['page_obj']
+
+        response = self.client.get(
+            reverse('posts:index') + f'?cursor={second_page.previous_cursor}'
+        )
+        first_page = response.context['page_obj']
+        self.assertEqual(first_page.number, 1)
+        self.assertEqual(len(first_page), self.POSTS_ON_PAGE)
+        self.assertFalse(first_page.previous_cursor)
+
+    def test_invalid_cursor_shows_first_page(self):
+        response = self.client.get(reverse('posts:index') + '?cursor=bad')
+        self.assertEqual(response.context['page_obj'].number, 1)
+
+
+@override_settings(COMMENTS_PER_PAGE=3)
+class CommentPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='commenter')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.user, text=f'Комментарий {i}')
+            for i in range(5)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_first_chunk_newest_first(self):
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        comments = response.context['comments']
+        self.assertEqual(
+            [comment.text for comment in comments],
+            ['Комментарий 4', 'Комментарий 3', 'Комментарий 2'],
+        )
+        self.assertContains(
+            response,
+            reverse('posts:post_comments', kwargs={'post_id': self.post.pk})
+            + f'?cursor={comments.next_cursor}',
+        )
+
+    def test_fragment_returns_next_chunk(self):
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.pk})
+        first = self.client.get(url).context['comments']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'{url}?cursor={first.next_cursor}')
+        # авторы подтягиваются тем же запросом, что и комментарии
+        self.assertEqual(
+            [query['sql'] for query in queries
+             if 'auth_user' in query['sql']],
+            [query['sql'] for query in queries
+             if 'posts_comment' in query['sql']],
+        )
+        self.assertTemplateUsed(response, 'posts/includes/comment_list.html')
+        self.assertTemplateNotUsed(response, 'base.html')
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            ['Комментарий 1', 'Комментарий 0'],
+        )
+        self.assertNotContains(response, 'Показать ещё')
@@ -0,0 +1,218 @@
+"""Миниатюры картинок постов, создаваемые заранее в фоне.
+
+Шаблоны показывают миниатюры размеров из THUMBNAILS: ленты находят их
+для всей страницы разом (preload), а тег {% thumbnail %} идёт через
+бэкенд DeferredThumbnailBackend. При отрисовке миниатюра только ищется
+в хранилище ключей sorl-thumbnail; если её нет, создание уходит в фоновую
+задачу, а страница пока показывает исходную картинку и перерисовывается,
+когда миниатюра готова.
+
+Для тега <img> preload собирает Picture: адрес, размеры, srcset из
+готовых миниатюр размеров SRCSET и заглушку из поста, так что файлы
+картинок при отрисовке не открываются.
+"""
+import hashlib
+
+from django.core.cache import cache
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import (
+    EMPTY_VALUE, KVStore as CachedDBKVStore,
+)
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from core import tasks
+
+from . import generations
+from .models import Post
+
+# размеры и опции миниатюр, которые показывают шаблоны
+THUMBNAILS = {
+    'post': ('960x339', {'crop': 'center', 'upscale': True}),
+    'post_small': ('480x170', {'crop': 'center', 'upscale': True}),
+    'post_large': ('1920x678', {'crop': 'center', 'upscale': True}),
+}
+
+# миниатюры одной пропорции, из которых браузер выбирает по ширине экрана
+SRCSET = ('post_small', 'post', 'post_large')
+
+PENDING_TIMEOUT = 60
+
+
+def source(name):
+    """Картинка поста по имени, в хранилище поля Post.image."""
+    return ImageFile(name, Post._meta.get_field('image').storage)
+
+
+def generate(name, geometry, options):
+    """Создаёт миниатюру картинки name, если её ещё нет."""
+    try:
+        image = source(name)
+        if not DeferredThumbnailBackend().lookup(image, geometry, **options):
+            ThumbnailBackend().get_thumbnail(image, geometry, **options)
+    finally:
+        cache.delete(_pending_key(name, geometry, options))
+    # страницы, закешированные с исходной картинкой, пора перерисовать,
+    # даже если миниатюру успела создать другая задача
+    for post in Post.objects.filter(image=name).only('author', 'group'):
+        generations.invalidate(*generations.post_scopes(post))
+
+
+def _pending_key(name, geometry, options):
+    digest = hashlib.md5(
+        repr((name, geometry, sorted(options.items()))).encode()
+    ).hexdigest()
+    return f'thumbnail.pending.{digest}'
+
+
+def schedule(name, geometry, options):
+    """Ставит создание миниатюры в очередь, если она ещё не там."""
+    if cache.add(
+        _pending_key(name, geometry, options), 1, PENDING_TIMEOUT
+    ):
+        tasks.submit(generate, name, geometry, options)
+
+
+def schedule_all(image):
+    """Ставит в очередь все миниатюры, которые понадобятся шаблонам."""
+    if image:
+        for geometry, options in THUMBNAILS.values():
+            schedule(image.name, geometry, dict(options))
+
+
+class DeferredThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl-thumbnail, который не обрабатывает картинки в запросе."""
+
+    def thumbnail_file(self, file_, geometry_string, **options):
+        """Файл миниатюры с тем же именем, что даёт get_thumbnail()."""
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def lookup(self, file_, geometry_string, **options):
+        """Готовая миниатюра или None, без обращения к картинке."""
+        return default.kvstore.get(
+            self.thumbnail_file(file_, geometry_string, **options)
+        )
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if not file_:
+            raise ValueError('falsey file_ argument in get_thumbnail()')
+        thumbnail = self.lookup(file_, geometry_string, **dict(options))
+        if thumbnail:
+            return thumbnail
+        schedule(ImageFile(file_).name, geometry_string, options)
+        return ImageFile(file_)
+
+
+def lookup_many(images, sizes=('post',)):
+    """Готовые миниатюры картинок: {(имя картинки, размер): ImageFile}.
+
+    Ключи всех размеров ищутся в кеше хранилища ключей sorl-thumbnail
+    одним get_many, а промахи — одним запросом к его таблице.
+    """
+    backend = DeferredThumbnailBackend()
+    files = {}
+    for size in sizes:
+        geometry, options = THUMBNAILS[size]
+        for image in images:
+            files[image.name, size] = backend.thumbnail_file(
+                image, geometry, **options
+            )
+    kvstore = default.kvstore
+    if not isinstance(kvstore, CachedDBKVStore):
+        found = {found: kvstore.get(file) for found, file in files.items()}
+        return {found: file for found, file in found.items() if file}
+
+    keys = {add_prefix(file.key): found for found, file in files.items()}
+    values = kvstore.cache.get_many(list(keys))
+    missing = [key for key in keys if key not in values]
+    if missing:
+        stored = dict(KVStoreModel.objects.filter(
+            key__in=missing
+        ).values_list('key', 'value'))
+        # отсутствие миниатюры кешируется так же, как у sorl-thumbnail
+        loaded = {key: stored.get(key, EMPTY_VALUE) for key in missing}
+        kvstore.cache.set_many(
+            loaded, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT
+        )
+        values.update(loaded)
+    return {
+        found: deserialize_image_file(values[key])
+        for key, found in keys.items()
+        if values.get(key) not in (None, EMPTY_VALUE)
+    }
+
+
+class Picture:
+    """Всё, что нужно шаблону для тега <img> картинки поста."""
+
+    def __init__(self, url, width=None, height=None, srcset='',
+                 placeholder=''):
+        self.url = url
+        self.width = width
+        self.height = height
+        self.srcset = srcset
+        self.placeholder = placeholder
+
+
+def _picture(post, found, size):
+    name = post.image.name
+    for wanted in dict.fromkeys((size, *SRCSET)):
+        if (name, wanted) not in found:
+            geometry, options = THUMBNAILS[wanted]
+            schedule(name, geometry, dict(options))
+    thumbnail = found.get((name, size))
+    if thumbnail is None:
+        return Picture(
+            post.image.url,
+            post.image_width,
+            post.image_height,
+            placeholder=post.image_placeholder,
+        )
+    # маленькие картинки растянуты до одних и тех же размеров: без
+    # повторов ширины, иначе srcset недействителен
+    candidates = {}
+    for wanted in SRCSET:
+        candidate = found.get((name, wanted))
+        if candidate is not None:
+            candidates.setdefault(candidate.width, candidate.url)
+    srcset = ', '.join(
+        f'{url} {width}w' for width, url in sorted(candidates.items())
+    )
+    return Picture(
+        thumbnail.url,
+        thumbnail.width,
+        thumbnail.height,
+        srcset if len(candidates) > 1 else '',
+        post.image_placeholder,
+    )
+
+
+def preload(posts, size='post'):
+    """Кладёт в post.thumbnail картинку каждого поста (Picture).
+
+    Пока миниатюры нет, там лежит исходная картинка, а создание миниатюр
+    ставится в очередь; у постов без картинки там None.
+    """
+    posts = list(posts)
+    found = lookup_many(
+        [post.image for post in posts if post.image],
+        dict.fromkeys((size, *SRCSET)),
+    )
+    for post in posts:
+        post.thumbnail = None
+        if post.image:
+            post.thumbnail = _picture(post, found, size)
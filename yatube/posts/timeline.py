@@ -0,0 +1,121 @@
+"""Лента подписок с раскладкой постов при публикации.
+
+Новый пост сразу попадает в TimelineEntry каждого подписчика автора.
+Авторы, у которых подписчиков больше settings.TIMELINE_FANOUT_LIMIT,
+не раскладываются: их посты подмешиваются в ленту при чтении слиянием
+чтений по ключу из ленты читателя и из ленты каждого такого автора.
+"""
+from django.conf import settings
+
+from .counters import followers_count
+from .models import Follow, Post, TimelineEntry, User
+from .paginator import get_merged_page, get_page
+
+BATCH_SIZE = 500
+
+
+def is_celebrity(author_id):
+    return followers_count(author_id) > settings.TIMELINE_FANOUT_LIMIT
+
+
+def _insert(entries):
+    TimelineEntry.objects.bulk_create(
+        entries, batch_size=BATCH_SIZE, ignore_conflicts=True
+    )
+
+
+def fan_out(post):
+    """Кладёт новый пост в ленты подписчиков автора."""
+    if is_celebrity(post.author_id):
+        return
+    followers = Follow.objects.filter(author_id=post.author_id).values_list(
+        'user_id', flat=True
+    )
+    _insert(
+        TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+        for user_id in followers.iterator()
+    )
+
+
+def backfill(user_id, author_id):
+    """Кладёт все посты автора в ленту нового подписчика."""
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date'
+    )
+    _insert(
+        TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for post_id, pub_date in posts.iterator()
+    )
+
+
+def backfill_followers(author_id):
+    """Раскладывает историю автора, переставшего быть знаменитостью."""
+    followers = Follow.objects.filter(author_id=author_id).values_list(
+        'user_id', flat=True
+    )
+    for user_id in followers.iterator():
+        backfill(user_id, author_id)
+
+
+def drop(user_id, author_id):
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def reassign(post):
+    """Переносит пост в ленты подписчиков нового автора."""
+    TimelineEntry.objects.filter(post=post).delete()
+    fan_out(post)
+
+
+def follow_sources(user):
+    """Из чего складывается лента подписок читателя.
+
+    Возвращает записи TimelineEntry читателя и список постов каждого
+    знаменитого автора, на которого он подписан. Каждый набор читается
+    по своему индексу, а сливаются они при выдаче страницы.
+    """
+    celebrities = Follow.objects.filter(
+        user=user,
+        author__counters__followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).values_list('author_id', flat=True)
+    return TimelineEntry.objects.filter(user=user), [
+        Post.objects.filter(author_id=author_id)
+        for author_id in celebrities
+    ]
+
+
+def get_follow_page(request, user):
+    """Страница ленты подписок пользователя."""
+    entries, celebrities = follow_sources(user)
+    entries = entries.select_related('post__author', 'post__group')
+    if not celebrities:
+        page = get_page(request, entries, pk_field='post_id')
+        page.object_list = [entry.post for entry in page.object_list]
+        return page
+
+    page = get_merged_page(request, [(entries, 'post_id')] + [
+        (posts.select_related('author', 'group'), 'pk')
+        for posts in celebrities
+    ])
+    page.object_list = [
+        row.post if origin == 0 else row
+        for origin, row in zip(page.origins, page.object_list)
+    ]
+    return page
+
+
+def rebuild(user=None):
+    """Пересобирает ленты подписок одного или всех пользователей."""
+    users = [user] if user is not None else User.objects.filter(
+        follower__isnull=False
+    ).distinct().iterator()
+    for reader in users:
+        TimelineEntry.objects.filter(user=reader).delete()
+        authors = Follow.objects.filter(user=reader).values_list(
+            'author', flat=True
+        )
+        for author_id in authors:
+            if not is_celebrity(author_id):
+                backfill(reader.pk, author_id)
@@ -1,15 +1,34 @@
 from django.urls import path
-from . import views
+from . import feeds, views
 
 app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('rss/', feeds.PostsFeed(), name='index_rss'),
+    path('atom/', feeds.PostsAtomFeed(), name='index_atom'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
+    path('group/<slug:slug>/rss/', feeds.GroupFeed(), name='group_rss'),
+    path(
+        'group/<slug:slug>/atom/', feeds.GroupAtomFeed(), name='group_atom'
+    ),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path(
+        'profile/<str:username>/rss/', feeds.AuthorFeed(), name='profile_rss'
+    ),
+    path(
+        'profile/<str:username>/atom/',
+        feeds.AuthorAtomFeed(),
+        name='profile_atom'
+    ),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path('search/', views.post_search, name='search'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments, name='post_comments'
+    ),
     path(
         'posts/<int:post_id>/comment/',
         views.add_comment, name='add_comment'
@@ -20,6 +39,11 @@ urlpatterns = [
         views.profile_follow,
         name='profile_follow'
     ),
+    path(
+        'profile/<str:username>/export/',
+        views.profile_export,
+        name='profile_export'
+    ),
     path(
         'profile/<str:username>/unfollow/',
         views.profile_unfollow,
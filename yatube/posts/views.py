@@ -1,20 +1,25 @@
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.core.exceptions import PermissionDenied
+from django.http import StreamingHttpResponse
 from django.shortcuts import redirect, render, get_object_or_404
 
 from .forms import PostForm, CommentForm
+from . import exporter, generations, images, search
+from .boundaries import FEED_ALL, feed_key
+from .counters import user_counters
 from .models import Post, Group, User, Follow
+from .paginator import get_chunk, get_page
+from .timeline import get_follow_page
 
 
 def index(request):
     posts = Post.objects.select_related('author', 'group')
-    paginator = Paginator(posts, settings.MAX_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = get_page(request, posts, feed=feed_key())
 
     context = {
         'page_obj': page_obj,
+        'generation': generations.for_request(request, feed_key()),
         'title': 'Последние обновления на сайте',
         'index': True,
     }
@@ -24,13 +29,13 @@ def index(request):
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     posts = group.posts.select_related('author')
-
-    paginator = Paginator(posts, settings.MAX_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = get_page(request, posts, feed=feed_key(group=group))
 
     context = {
         'page_obj': page_obj,
+        'generation': generations.for_request(
+            request, feed_key(group=group)
+        ),
         'title': f'Записи сообщества "{group.title}"',
         'group': group,
     }
@@ -38,40 +43,75 @@ def group_posts(request, slug):
 
 
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('counters'), username=username
+    )
     posts = author.posts.select_related('group')
-    author_posts_count = posts.count()
-
-    paginator = Paginator(posts, settings.MAX_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-
-    following = False
-    if request.user.is_authenticated:
-        following = author.following.filter(user=request.user).exists()
+    page_obj = get_page(request, posts, feed=feed_key(author=author))
+    counters = user_counters(author)
 
     context = {
         'page_obj': page_obj,
+        'generation': generations.for_request(
+            request, feed_key(author=author)
+        ),
         'author': author,
-        'author_posts_count': author_posts_count,
-        'following': following,
+        'author_posts_count': counters.posts_count,
+        'counters': counters,
     }
     return render(request, 'posts/profile.html', context)
 
 
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    author_posts_count = post.author.posts.count()
-    comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.select_related('author__counters', 'group'), id=post_id
+    )
+    author_posts_count = user_counters(post.author).posts_count
+    generations.for_request(request, *generations.post_scopes(post))
     context = {
         'post': post,
         'author_posts_count': author_posts_count,
         'form': CommentForm(request.POST or None),
-        'comments': comments,
+        'comments': get_comments(request, post),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def get_comments(request, post):
+    return get_chunk(
+        request,
+        post.comments.select_related('author'),
+        settings.COMMENTS_PER_PAGE,
+        date_field='created',
+    )
+
+
+def post_comments(request, post_id):
+    """Следующая порция комментариев поста — фрагмент HTML."""
+    post = get_object_or_404(Post.objects.only('author', 'group'), id=post_id)
+    generations.for_request(request, *generations.post_scopes(post))
+    context = {
+        'post': post,
+        'comments': get_comments(request, post),
+    }
+    return render(request, 'posts/includes/comment_list.html', context)
+
+
+def post_search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = search.search(
+        query, settings.MAX_POSTS, request.GET.get('cursor')
+    )
+    # результаты зависят от любого поста или комментария
+    generations.for_request(request, FEED_ALL)
+    context = {
+        'page_obj': page_obj,
+        'query': query,
+        'title': f'Поиск: {query}' if query else 'Поиск',
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required()
 def post_create(request):
     form = PostForm(
@@ -89,6 +129,7 @@ def post_create(request):
     new_post = form.save(commit=False)
     new_post.author = request.user
     new_post.save()
+    images.schedule(new_post)
     return redirect(
         'posts:profile', username=request.user.username
     )
@@ -114,7 +155,9 @@ def post_edit(request, post_id):
     if not form.is_valid():
         return render(request, template, {'form': form, 'is_edit': True})
 
-    form.save()
+    post = form.save()
+    if 'image' in form.changed_data:
+        images.schedule(post)
     return redirect('posts:post_detail', post_id=post_id)
 
 
@@ -133,12 +176,25 @@ def add_comment(request, post_id):
 
 
 @login_required
-def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
+def profile_export(request, username):
+    author = get_object_or_404(User, username=username)
+    if author != request.user and not request.user.is_staff:
+        raise PermissionDenied
+    fmt = request.GET.get('format', 'jsonl')
+    if fmt not in exporter.FORMATS:
+        fmt = 'jsonl'
+    response = StreamingHttpResponse(
+        exporter.export(author, fmt), content_type=exporter.FORMATS[fmt]
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{author.username}.{fmt}"'
+    )
+    return response
 
-    paginator = Paginator(posts, settings.MAX_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+
+@login_required
+def follow_index(request):
+    page_obj = get_follow_page(request, request.user)
     context = {
         'page_obj': page_obj,
         'title': 'Последние обновления на сайте - подписки',
@@ -50,12 +50,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'posts.middleware.AnonymousPageCacheMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'posts.middleware.PageShellMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -88,6 +90,8 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # счётчики и индексы лент обновляются сигналами в той же транзакции
+        'ATOMIC_REQUESTS': True,
     }
 }
 
@@ -115,8 +119,14 @@ LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 # LOGOUT_REDIRECT_URL = 'posts:index'
 
-#  подключаем движок filebased.EmailBackend
-EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+# письма ставятся в очередь (core.mail), а задача core.jobs, которую
+# выполняет manage.py run_worker, отправляет их порциями через
+# EMAIL_DELIVERY_BACKEND; в бою здесь будет SMTP. Без запущенного
+# run_worker письма не уходят при любом TASKS_BACKEND
+EMAIL_BACKEND = 'core.mail.QueuedEmailBackend'
+EMAIL_DELIVERY_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+EMAIL_BATCH_SIZE = 50
+EMAIL_MAX_ATTEMPTS = 5
 # указываем директорию, в которую будут складываться файлы писем
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
@@ -145,11 +155,75 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# быстрый кеш в памяти процесса перед кешем в файле SQLite, общим
+# для всех процессов сервера на этой машине; поколения и ключи
+# sorl-thumbnail (готова ли миниатюра) всегда читаются из общего кеша
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.TieredCache',
         'TIMEOUT': 20,
-    }
+        'OPTIONS': {
+            'L2': 'shared',
+            'L1_MAX_ENTRIES': 1000,
+            'L1_TIMEOUT': 5,
+            'L1_EXCLUDE': ('generation:', 'sorl-thumbnail||'),
+            'STALE_TIMEOUT': 60,
+        },
+    },
+    'shared': {
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.environ.get(
+            'CACHE_LOCATION', os.path.join(BASE_DIR, 'cache.sqlite3')
+        ),
+        'TIMEOUT': 20,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+            'MAX_SIZE': 64 * 2 ** 20,
+        },
+    },
 }
 
+# кеш в памяти и синхронные задачи для тестов включает core.testing
+TEST_RUNNER = 'core.testing.TestRunner'
+
+# фоновые задачи core.tasks: число потоков и синхронный режим
+TASK_WORKERS = 2
+TASKS_EAGER = False
+# 'threads' — пул потоков веб-процесса, 'jobs' — очередь в базе
+# (core.jobs), которую разбирает manage.py run_worker; почта идёт через
+# core.jobs всегда, так что run_worker нужен и при 'threads'
+TASKS_BACKEND = 'threads'
+
+# очередь core.jobs: попыток на задачу, через сколько секунд задача
+# упавшего обработчика снова свободна, сколько хранить выполненные
+# и как часто обработчик опрашивает пустую очередь
+JOBS_MAX_ATTEMPTS = 5
+JOBS_LEASE = 30 * 60
+JOBS_KEEP_DONE = 7 * 24 * 60 * 60
+JOBS_POLL_INTERVAL = 1
+
+# ограничения загружаемых картинок постов и параметры их перекодирования
+POST_IMAGE_MAX_SIZE = 10 * 2 ** 20
+POST_IMAGE_MAX_PIXELS = 40_000_000
+POST_IMAGE_MAX_DIMENSION = 2048
+POST_IMAGE_QUALITY = 85
+# файлы картинок моложе этого (в секундах) очистка не удаляет
+MEDIA_CLEANUP_GRACE = 60 * 60
+
+# миниатюры создаются в фоне, страницы их только читают
+THUMBNAIL_BACKEND = 'posts.thumbnails.DeferredThumbnailBackend'
+
 MAX_POSTS = 10
+# сколько последних постов в RSS и Atom
+FEED_ITEMS = 20
+# комментарии под постом подгружаются порциями, новые сверху
+COMMENTS_PER_PAGE = 20
+
+# сколько живут целые страницы в кеше для анонимных посетителей
+PAGE_CACHE_TIMEOUT = 300
+# сколько промежуточные кеши могут отдавать такие страницы без проверки
+PAGE_MAX_AGE = 30
+
+# посты авторов с большим числом подписчиков не раскладываются по лентам
+# подписок при публикации, а подмешиваются при чтении
+TIMELINE_FANOUT_LIMIT = 1000